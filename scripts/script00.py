@@ -63,7 +63,8 @@ for folder in gpkg_folders:
         folder_gpkgs = [f for f in folder_contents if f[-5:]==".gpkg"]
         if folder_gpkgs:
             for gpkg in folder_gpkgs:
-                gdfs[gpkg] = gpd.read_file(folder + gpkg)
+                # only the CRS is needed: read 1 row (point layers can be very large)
+                gdfs[gpkg] = gpd.read_file(folder + gpkg, rows=1)
 
 my_crs = gdfs["studyarea.gpkg"].crs  
 for k, v in gdfs.items():
@@ -85,8 +86,26 @@ for geom in geoms:
         files = [f.replace(".gpkg", "") for f in os.listdir(input_folder + geom) if f[-5:]==".gpkg"]
         for f in files:
             assert f in config, f"Buffer configuration for {f} missing in config-{geom}.yml file, please provide before continuing!"
+            if geom == "point" and isinstance(config[f], list):
+                assert config[f] and all(d > 0 for d in config[f]), f"Please provide a non-empty list of positive distance thresholds for {f} in config-point.yml before continuing!"
+            if geom == "polygon" and isinstance(config[f], list):
+                assert config[f] and all(d >= 0 for d in config[f]), f"Please provide a non-empty list of non-negative buffer distances for {f} in config-polygon.yml before continuing!"
         print(f"Configurations for {geom} layers checked. \n")
 
+# EVALUATION SETTINGS
+if os.path.exists(input_folder + "point") or os.path.exists(input_folder + "polygon"):
+    print("*** Checking config-evaluation.yml file... ***")
+    config = yaml.load(open(config_folder + "config-evaluation.yml"), Loader=yaml.FullLoader)
+    assert config, "Empty config-evaluation.yml file - please provide before continuing!"
+    assert config["point_engine"] in ["buffer", "distance", "network"], "Please provide a valid point_engine (\"buffer\", \"distance\" or \"network\") in config-evaluation.yml before continuing"
+    assert config["polygon_engine"] in ["union", "local", "raster"], "Please provide a valid polygon_engine (\"union\", \"local\" or \"raster\") in config-evaluation.yml before continuing"
+    assert config["polygon_resolution"] > 0, "Please provide a valid polygon_resolution (positive number) in config-evaluation.yml before continuing"
+    assert config["polygon_max_vertices"] is None or config["polygon_max_vertices"] >= 8, "Please provide a valid polygon_max_vertices (integer >= 8, or null) in config-evaluation.yml before continuing"
+    assert config["point_chunk_size"] is None or config["point_chunk_size"] > 0, "Please provide a valid point_chunk_size (positive integer or null) in config-evaluation.yml before continuing"
+    assert isinstance(config["workers"], int) and config["workers"] >= 1, "Please provide a valid number of workers (integer >= 1) in config-evaluation.yml before continuing"
+    del config
+    print("config-evaluation.yml file checked. \n")
+
 # SLOPES
 if os.path.exists(input_folder + "dem/dem.tif"):
     print("*** Checking config-slope.yml file... ***")
@@ -94,8 +113,15 @@ if os.path.exists(input_folder + "dem/dem.tif"):
     assert config, "Empty config-slope.yml file - please provide before continuing!"
     segment_length = config["segment_length"]
     slope_ranges = config["slope_ranges"]
-    assert segment_length > 0, "Segment length cannot be < 0. Please provide valid segment length in config-slope.yml before continuing"
+    if isinstance(segment_length, list):
+        assert segment_length and all(l > 0 for l in segment_length), "Please provide a non-empty list of positive segment lengths in config-slope.yml before continuing"
+    else:
+        assert segment_length > 0, "Segment length cannot be < 0. Please provide valid segment length in config-slope.yml before continuing"
     assert len(slope_ranges) == 4 and sorted(slope_ranges)==slope_ranges, "Please provide valid slope ranges in [0, a, b, c] format in config-slope.yml before continuing"
+    assert config["sustained_window"] > 0, "Please provide a valid sustained_window (positive number) in config-slope.yml before continuing"
+    assert isinstance(config["dem_window_size"], int) and config["dem_window_size"] > 0, "Please provide a valid dem_window_size (positive integer) in config-slope.yml before continuing"
+    assert isinstance(config["dem_cache"], bool), "Please provide a valid dem_cache setting (True or False) in config-slope.yml before continuing"
+    assert isinstance(config["workers"], int) and config["workers"] >= 1, "Please provide a valid number of workers (integer >= 1) in config-slope.yml before continuing"
     del config
     print("config-slope.yml file checked. \n")
 
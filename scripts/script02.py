@@ -28,11 +28,27 @@ exec(open(homepath + "/src/eval_func.py").read())
 config_display = yaml.load(
     open(homepath + "/config/config-display.yml"), Loader=yaml.FullLoader
 )
+config_evaluation = yaml.load(
+    open(homepath + "/config/config-evaluation.yml"), Loader=yaml.FullLoader
+)
+point_engine = config_evaluation["point_engine"]
+polygon_engine = config_evaluation["polygon_engine"]
+polygon_max_vertices = config_evaluation["polygon_max_vertices"]
+polygon_resolution = config_evaluation["polygon_resolution"]
+point_incidence = config_evaluation["point_incidence"]
+point_chunk_size = config_evaluation["point_chunk_size"]
+workers = config_evaluation["workers"]
 
 # load edges
 edgepath = homepath + "/data/input/network/processed/edges.gpkg"
 edges = gpd.read_file(edgepath)
 
+# load nodes (knudepunkter), used as origins for network distances
+nodepath = homepath + "/data/input/network/processed/nodes.gpkg"
+nodes = None
+if point_engine == "network" and os.path.exists(nodepath):
+    nodes = gpd.read_file(nodepath)
+
 # load evaluation data
 evaldict = {}
 
@@ -56,9 +72,7 @@ for geomtype in geomtypes:
             geomlayer_name = geomlayer.replace(".gpkg", "")
             evaldict[geomtype][geomlayer_name] = {}
             evaldict[geomtype][geomlayer_name]["filepath"] = geompath + geomlayer
-            evaldict[geomtype][geomlayer_name]["gpkg"] = gpd.read_file(
-                geompath + geomlayer
-            )
+            # (layers are read from filepath during evaluation, not kept in memory here)
             evaldict[geomtype][geomlayer_name]["bufferdistance"] = config_geomtype[
                 geomlayer_name
             ]
@@ -120,30 +134,105 @@ if any(evaldict.values()):  # if any of the "point", "polygon" dicts is non-empt
     # initialize stats results dictionary
     res = {}
 
-    # evaluate point layers
+    # collect evaluation tasks (one per layer)
+    tasks = []
+
+    # point layers
     if evaldict["point"]:
+        for k, v in evaldict["point"].items():
+            mydist = v["bufferdistance"]
+            # if several distance thresholds are given, the first one is used for the output layers
+            if isinstance(mydist, list):
+                mydist = mydist[0]
+            v["within_fp"] = (
+                v["filepath"]
+                .replace("input", "output")
+                .replace(".gpkg", f"_within_{mydist}.gpkg")
+            )
+            v["outside_fp"] = (
+                v["filepath"]
+                .replace("input", "output")
+                .replace(".gpkg", f"_outside_{mydist}.gpkg")
+            )
+            tasks.append(
+                {
+                    "geomtype": "point",
+                    "kwargs": {
+                        "input_fp": v["filepath"],
+                        "within_reach_output_fp": v["within_fp"],
+                        "outside_reach_output_fp": v["outside_fp"],
+                        "dist": v["bufferdistance"],
+                        "name": k,
+                        "engine": point_engine,
+                        "chunk_size": point_chunk_size,
+                        "incidence_output_fp": (
+                            v["filepath"]
+                            .replace("input", "output")
+                            .replace(".gpkg", f"_incidence_{mydist}")
+                            if point_incidence
+                            else None
+                        ),
+                    },
+                }
+            )
+
+    # evaluate linestring layers
+    # TODO
+    # if evaldict["linestring"]:
+    #     # not implemented
+    #     pass
+
+    # polygon layers
+    if evaldict["polygon"]:
+        for k, v in evaldict["polygon"].items():
+            mydist = v["bufferdistance"]
+            # if several buffer distances are given, the first one is used for the output layer
+            if isinstance(mydist, list):
+                mydist = mydist[0]
+            v["output_fp"] = (
+                v["filepath"].replace("input", "output").replace(".gpkg", f"_{mydist}.gpkg")
+            )
+            tasks.append(
+                {
+                    "geomtype": "polygon",
+                    "kwargs": {
+                        "input_fp": v["filepath"],
+                        "output_fp": v["output_fp"],
+                        "dist": v["bufferdistance"],
+                        "name": k,
+                        "type_col": "types",
+                        "fill_color_rgb": config_colors[k],
+                        "outline_color_rgb": config_colors[k],
+                        "line_color_rgb": config_colors[k],
+                        "engine": polygon_engine,
+                        "max_vertices": polygon_max_vertices,
+                        "resolution": polygon_resolution,
+                    },
+                }
+            )
+
+    # evaluate all layers (in parallel worker processes, if workers > 1)
+    if workers > 1:
+        print(f"Evaluating {len(tasks)} layers with {workers} worker processes...")
+    for res_current in run_evaluation_tasks(
+        tasks, edges, nodes, workers=workers
+    ):
+        res = res | res_current
+
+    # display point layers (in QGIS, after evaluation)
+    if evaldict["point"] and config_display["display_evaluation_output"]:
         for k, v in evaldict["point"].items():
             # create darker value for reached items
             rgb_shaded = rgb_shade(config_colors[k])
-            mydist = v["bufferdistance"]
             (
                 output_name_within_current,
                 output_name_outside_current,
-                res_current,
-            ) = evaluate_export_plot_point(
-                input_fp=v["filepath"],
-                within_reach_output_fp=v["filepath"]
-                .replace("input", "output")
-                .replace(".gpkg", f"_within_{mydist}.gpkg"),
-                outside_reach_output_fp=v["filepath"]
-                .replace("input", "output")
-                .replace(".gpkg", f"_outside_{mydist}.gpkg"),
-                network_edges=edges,
-                dist=mydist,
+            ) = display_point_evaluation(
+                within_reach_output_fp=v["within_fp"],
+                outside_reach_output_fp=v["outside_fp"],
                 name=k,
                 output_color_reached=config_colors[k],
                 output_color_not_reached=rgb_shaded,
-                display_output=config_display["display_evaluation_output"],
                 output_size_reached=4,
                 output_size_not_reached=2,
                 output_alpha="255",
@@ -151,7 +240,6 @@ if any(evaldict.values()):  # if any of the "point", "polygon" dicts is non-empt
 
             output_layers.append(output_name_within_current)
             output_layers.append(output_name_outside_current)
-            res = res | res_current
 
     point_layers = []
     labels = []
@@ -166,42 +254,27 @@ if any(evaldict.values()):  # if any of the "point", "polygon" dicts is non-empt
         render_heatmap(pl, label.title())
         output_layers.append(label.title() + " heatmap")
 
-    # print("test")
-    # evaluate linestring layers
-    # TODO
-    # if evaldict["linestring"]:
-    #     # not implemented
-    #     pass
-
-    # evaluate polygon layers
+    # display polygon layers (in QGIS, after evaluation)
     if evaldict["polygon"]:
         for k, v in evaldict["polygon"].items():
-            mydist = v["bufferdistance"]
-            (input_name_current, output_name_current, res_current) = (
-                evaluate_export_plot_poly(
-                    input_fp=v["filepath"],
-                    output_fp=v["filepath"]
-                    .replace("input", "output")
-                    .replace(".gpkg", f"_{mydist}.gpkg"),
-                    network_edges=edges,
-                    dist=mydist,
-                    name=k,
-                    type_col="types",
-                    fill_color_rgb=config_colors[k],
-                    outline_color_rgb=config_colors[k],
-                    line_color_rgb=config_colors[k],
-                    line_width=1,
-                    line_style="solid",
-                    plot_categorical=False,
-                    fill_alpha="100",
-                    outline_alpha="200",
-                    display_input=config_display["display_evaluation_input"],
-                    display_output=config_display["display_evaluation_output"],
-                )
+            (input_name_current, output_name_current) = display_polygon_evaluation(
+                input_fp=v["filepath"],
+                output_fp=v["output_fp"],
+                name=k,
+                type_col="types",
+                fill_color_rgb=config_colors[k],
+                outline_color_rgb=config_colors[k],
+                line_color_rgb=config_colors[k],
+                line_width=1,
+                line_style="solid",
+                plot_categorical=False,
+                fill_alpha="100",
+                outline_alpha="200",
+                display_input=config_display["display_evaluation_input"],
+                display_output=config_display["display_evaluation_output"],
             )
             input_layers.append(input_name_current)
             output_layers.append(output_name_current)
-            res = res | res_current
 
     ### VISUALIZATION (order layers)
     all_layers = input_layers + output_layers
@@ -18,6 +18,7 @@ if homepath not in sys.path:
 
 # load custom functions
 exec(open(homepath + "/src/plot_func.py").read())
+exec(open(homepath + "/src/slope_func.py").read())
 
 # load configs
 config_display = yaml.load(
@@ -28,9 +29,18 @@ display_slope = config_display["display_slope"]
 config_slope = yaml.load(
     open(homepath + "/config/config-slope.yml"), Loader=yaml.FullLoader
 )
-segment_length = config_slope["segment_length"]
+# one or several segment lengths (the first one is used for display)
+segment_lengths = config_slope["segment_length"]
+if not isinstance(segment_lengths, list):
+    segment_lengths = [segment_lengths]
+segment_length = segment_lengths[0]
+sample_length = min(segment_lengths)
 slope_ranges = config_slope["slope_ranges"]
 slope_threshold = slope_ranges[-1]
+sustained_window = config_slope["sustained_window"]
+dem_window_size = config_slope["dem_window_size"]
+dem_cache = config_slope["dem_cache"]
+slope_workers = config_slope["workers"]
 
 config_color = yaml.load(
     open(homepath + "/config/config-colors-slope.yml"), Loader=yaml.FullLoader
@@ -46,35 +56,34 @@ os.makedirs(homepath + "/data/output/elevation/", exist_ok=True)
 # input
 edges_fp = homepath + "/data/input/network/processed/edges.gpkg"
 dem_fp = homepath + "/data/input/dem/dem.tif"
+dem_cache_dir = homepath + "/data/output/elevation/dem_cache/"
 
 # output
-segments_fp = homepath + "/data/output/elevation/segments.gpkg"
-elevation_vals_segments_fp = (
-    homepath + "/data/output/elevation/elevation_values_edges.gpkg"
-)
 segments_slope_fp = homepath + "/data/output/elevation/segments_slope.gpkg"
 edges_slope_fp = homepath + "/data/output/elevation/edges_slope.gpkg"
+edges_profile_fp = homepath + "/data/output/elevation/edges_profile.npz"
 steep_segments_fp = homepath + "/data/output/elevation/steep_segments.gpkg"
 stats_path = homepath + "/results/stats/stats_slope.json"
+stats_segments_path = homepath + "/results/stats/stats_slope_segments.npz"
 
 if os.path.exists(dem_fp):
 
     # print out user settings
     print("script04.py started with user settings:")
     print(f"\t Maximal segment length: {segment_length}m")
+    if len(segment_lengths) > 1:
+        print(f"\t Additional segment lengths: {segment_lengths[1:]} (from one DEM sampling at {sample_length}m)")
+    print(f"\t Worker processes: {slope_workers}")
     print(f"\t Display slope: {display_slope}")
     print(f"\t Slope threshold: {slope_threshold}% (percent)")
     print("Please be patient, this might take a while!")
-    print(f"If the script fails to complete, please try again!")
 
     ##### IMPORT STUDY AREA EDGES AS GDF
     edges = gpd.read_file(edges_fp)
     assert len(edges) == len(edges.edge_id.unique()), "Error: Edge ids are not unique"
+    edges_columns = list(edges.columns)
 
-    # ##### IMPORT STUDY AREA EDGES AS QGIS LAYER
-    vlayer_edges = QgsVectorLayer(edges_fp, "Network edges", "ogr")
-
-    # ##### IMPORT DIGITAL ELEVATION MODEL AS QGIS LAYER
+    # ##### IMPORT DIGITAL ELEVATION MODEL AS QGIS LAYER (FOR DISPLAY)
     remove_existing_layers(["DEM terrain"])
 
     dem_terrain = QgsRasterLayer(dem_fp, "DEM terrain")
@@ -82,102 +91,34 @@ if os.path.exists(dem_fp):
 
     # ##### GET SLOPE FOR EDGE SEGMENTS
 
-    # segmentize
-    line_segments = processing.run(
-        "native:splitlinesbylength",
-        {"INPUT": vlayer_edges, "LENGTH": segment_length, "OUTPUT": "TEMPORARY_OUTPUT"},
+    # split edges into segments and get elevation at segment start and end points
+    # (only the DEM windows containing segment start and end points are read;
+    # with several workers, in spatially coherent chunks of edges in parallel);
+    # the DEM is sampled once, with the shortest segment length
+    elevation_col = "elevation_1"
+    segs_sampled, ele_sampled = sample_edges(
+        edges,
+        dem_fp,
+        sample_length,
+        workers=slope_workers,
+        window_size=dem_window_size,
+        cache_dir=dem_cache_dir if dem_cache else None,
+        elevation_col=elevation_col,
     )
 
-    # delete "fid" field (to prevent problems when exporting a layer with non-unique fields)
-    segments_temp_layer = line_segments["OUTPUT"]
-    layer_provider = segments_temp_layer.dataProvider()
-    fid_idx = segments_temp_layer.fields().indexOf("fid")
-    segments_temp_layer.dataProvider().deleteAttributes([fid_idx])
-    segments_temp_layer.updateFields()
-
-    # create new unique segment id
-    segments_temp_layer.dataProvider().addAttributes(
-        [QgsField("segment_id", QVariant.Int)]
-    )
-    segments_temp_layer.updateFields()
-    fld_idx = segments_temp_layer.fields().lookupField("segment_id")
-    atts_map = {ft.id(): {fld_idx: ft.id()} for ft in segments_temp_layer.getFeatures()}
-    segments_temp_layer.dataProvider().changeAttributeValues(atts_map)
-    print("all good")
-
-    # export
-    _writer = QgsVectorFileWriter.writeAsVectorFormat(
-        segments_temp_layer,
-        segments_fp,
-        "utf-8",
-        segments_temp_layer.crs(),
-        "GPKG",
-    )
+    print(f"done: sampled elevation at segment start and end points every {sample_length} meters.")
 
-    vlayer_segments = QgsVectorLayer(
-        segments_fp,
-        "Segments",
-        "ogr",
-    )
+    # segments of the (first) segment length
+    if segment_length == sample_length:
+        segs, ele = segs_sampled, ele_sampled
+    else:
+        segs, ele = resample_segments(
+            edges, segs_sampled, ele_sampled, segment_length, elevation_col=elevation_col
+        )
 
     print(f"done: line split into segments of max length {segment_length} meters.")
 
-    # GET START AND END VERTICES
-    segment_vertices = processing.run(
-        "native:extractspecificvertices",
-        {
-            "INPUT": vlayer_segments,
-            "VERTICES": "0,-1",
-            "OUTPUT": "TEMPORARY_OUTPUT",
-        },
-    )
-
-    print(f"done: extracted segment start and end points")
-
-    elevation_values = processing.run(
-        "native:rastersampling",
-        {
-            "INPUT": segment_vertices["OUTPUT"],
-            "RASTERCOPY": dem_terrain,
-            "COLUMN_PREFIX": "elevation_",
-            "OUTPUT": "TEMPORARY_OUTPUT",  # elevation_vals_fp,
-        },
-    )
-
-    # export
-    elevation_temp_layer = elevation_values["OUTPUT"]
-    # delete "fid" field (to prevent problems when exporting a layer with non-unique fields)
-    layer_provider = elevation_temp_layer.dataProvider()
-    fid_idx = elevation_temp_layer.fields().indexOf("fid")
-    elevation_temp_layer.dataProvider().deleteAttributes([fid_idx])
-    elevation_temp_layer.updateFields()
-
-    _writer = QgsVectorFileWriter.writeAsVectorFormat(
-        elevation_temp_layer,
-        elevation_vals_segments_fp,
-        "utf-8",
-        elevation_temp_layer.crs(),
-        "GPKG",
-    )
-
-    ele = gpd.read_file(elevation_vals_segments_fp)
-    segs = gpd.read_file(segments_fp)
-    segs["length"] = segs.length
-    elevation_col = "elevation_1"
-    grouped = ele.groupby("segment_id")
-    segs["slope"] = None
-
-    for seg_id, group in grouped:
-        if len(group) != 2:
-            print(f"Error, got {len(group)} row(s)")
-        else:
-            e1 = group[elevation_col].values[0]
-            e2 = group[elevation_col].values[1]
-            seg_length = segs.loc[segs.segment_id == seg_id].geometry.length.values[0]
-            slope = (e2 - e1) / (seg_length - 0)
-            segs["slope"].loc[segs.segment_id == seg_id] = abs(slope) * 100
-
-    segs["slope"].fillna(0, inplace=True)
+    segs = add_segment_slopes(segs, ele, elevation_col=elevation_col)
 
     if os.path.exists(segments_slope_fp):
         os.remove(segments_slope_fp)
@@ -205,20 +146,16 @@ if os.path.exists(dem_fp):
 
     ### GET MIN MAX AVE SLOPE FOR EDGES (BASED ON EDGE SEGMENTS) ######
 
-    edges["min_slope"] = 0
-    edges["max_slope"] = 0
-    edges["ave_slope"] = 0
-
-    grouped = segs.groupby("edge_id")
+    # and climb metrics (length-weighted average slope, max sustained slope,
+    # and slope, ascent and descent in each direction: u->v along the edge geometry, v->u reversed)
+    edges = add_edge_slopes(edges, segs, window=sustained_window)
 
-    for edge_id, group in grouped:
-        min_slope = group["slope"].min()
-        max_slope = group["slope"].max()
-        ave_slope = group["slope"].mean()
-
-        edges["min_slope"].loc[edges.edge_id == edge_id] = min_slope
-        edges["max_slope"].loc[edges.edge_id == edge_id] = max_slope
-        edges["ave_slope"].loc[edges.edge_id == edge_id] = ave_slope
+    # elevation profile of each edge (for routing, without resampling the DEM;
+    # from the shortest segment length)
+    save_edge_profiles(
+        compute_edge_profiles(segs_sampled, ele_sampled, elevation_col=elevation_col),
+        edges_profile_fp,
+    )
 
     ##### EXPORT RESULTS (SLOPE BY EDGE)
     if os.path.exists(edges_slope_fp):
@@ -252,15 +189,48 @@ if os.path.exists(dem_fp):
     steep_segments.to_file(steep_segments_fp, mode="w")
 
     ### Save summary statistics of slope computation
-    res = {}  # initialize stats results dictionary
-    res["segs_length"] = list(segs["length"])
-    res["segs_slope"] = list(segs["slope"])
-    res["segs_slope_min"] = segs.slope.min()
-    res["segs_slope_max"] = segs.slope.max()
-    res["segs_slope_mean"] = segs.slope.mean()
+    # (length and slope of each segment as arrays in a separate .npz file)
+    res = compute_slope_stats(segs, stats_segments_path)
     with open(stats_path, "w") as opened_file:
         json.dump(res, opened_file, indent=6)
 
+    ### ADDITIONAL SEGMENT LENGTHS (same outputs, with segment length as suffix; not displayed)
+    for other_length in segment_lengths[1:]:
+        if other_length == sample_length:
+            segs_other, ele_other = segs_sampled.copy(), ele_sampled
+        else:
+            segs_other, ele_other = resample_segments(
+                edges[edges_columns],
+                segs_sampled,
+                ele_sampled,
+                other_length,
+                elevation_col=elevation_col,
+            )
+        segs_other = add_segment_slopes(segs_other, ele_other, elevation_col=elevation_col)
+        edges_other = add_edge_slopes(
+            edges[edges_columns], segs_other, window=sustained_window
+        )
+
+        for gdf, fp in [
+            (segs_other, segments_slope_fp),
+            (edges_other, edges_slope_fp),
+            (segs_other.loc[segs_other.slope > slope_threshold], steep_segments_fp),
+        ]:
+            fp = fp.replace(".gpkg", f"_{other_length}.gpkg")
+            if os.path.exists(fp):
+                os.remove(fp)
+            gdf.to_file(fp, mode="w")
+
+        res_other = compute_slope_stats(
+            segs_other, stats_segments_path.replace(".npz", f"_{other_length}.npz")
+        )
+        with open(stats_path.replace(".json", f"_{other_length}.json"), "w") as opened_file:
+            json.dump(res_other, opened_file, indent=6)
+
+        print(
+            f"done: slopes for segment length {other_length}m (maximum {res_other['segs_slope_max']:.2f} %, average {res_other['segs_slope_mean']:.2f} %)"
+        )
+
     # ##### PLOT RESULTS (STEEP SEGMENTS)
 
     if display_slope:
@@ -315,9 +285,10 @@ if os.path.exists(dem_fp):
 
     print("script03.py ended successfully.")
 else:
-    # if file exists from previous runs
-    if os.path.exists(stats_path):
-        os.remove(stats_path)
+    # if files exist from previous runs
+    for fp in [stats_path, stats_segments_path]:
+        if os.path.exists(fp):
+            os.remove(fp)
     print("No DEM input file found, skipping slope evaluation.")
     print(
         "Please provide an input file dem.tif in the data/input/dem folder if you want to evaluate the network slope."
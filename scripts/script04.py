@@ -33,12 +33,12 @@ display_disconnected_components = config_display["display_disconnected_component
 
 # load custom functions
 exec(open(homepath + "/src/plot_func.py").read())
+exec(open(homepath + "/src/network_func.py").read())
 
 # INPUT/OUTPUT FILE PATHS
 
 for fp in [
     homepath + "/data/output/network/",
-    homepath + "/data/output/network/components/",
     homepath + "/data/results/",
     homepath + "/data/results/stats/",
 ]:
@@ -47,58 +47,33 @@ for fp in [
 # input
 # filepath_nodes_input = homepath + "/data/input/network/processed/nodes_studyarea.gpkg"
 filepath_edges_input = homepath + "/data/input/network/processed/edges.gpkg"
+graph_cache_dir = homepath + "/data/output/network/graph_cache/"
 
 # output
 filepath_edge_output = homepath + "/data/output/network/edges.gpkg"
 filepath_node_output = homepath + "/data/output/network/nodes.gpkg"
+filepath_components_output = homepath + "/data/output/network/components.gpkg"
 
 graph_file = homepath + "/data/output/network/network_graph.pickle"
 stats_path = homepath + "/results/stats/stats_network.json"  # store output here
 
-# load data
-edges_in = gpd.read_file(filepath_edges_input)
+# load network graph (only rebuilt if input edges have changed since last run)
+graph = load_network_graph(filepath_edges_input, graph_cache_dir)
+nodes, edges = graph["nodes"], graph["edges"]
 
-# convert to networkx object with momepy
-G = momepy.gdf_to_nx(
-    gdf_network=edges_in,
-    multigraph=False,
-    #    integer_labels=True, # only in momepy 0.8+
-    directed=False,
-)
-
-# remove degree 0 nodes
-degree_histogram = nx.degree_histogram(G)
+degree_histogram = graph["degree_histograms"]["input"]
 print(f"Degree histogram: {degree_histogram}")
 print(f"Number of nodes without edges: {degree_histogram[0]}.")
 print(f"Removing {degree_histogram[0]} nodes from the network.")
-nodes_to_remove = [node for node in G.nodes if nx.degree(G, node) == 0]
-G.remove_nodes_from(nodes_to_remove)
-degree_histogram = nx.degree_histogram(G)
-print(f"Degree histogram (updated): {degree_histogram}")
-
-# using momepy to get nodes and edges gdf with corresponding labels and geometry objects
-nodes, edges = momepy.nx_to_gdf(net=G, points=True, lines=True)
-
-### Add degree labels to nodes
-degrees = pd.DataFrame.from_dict(dict(G.degree), orient="index", columns=["degree"])
-nodes = nodes.merge(degrees, left_index=True, right_index=True)
+print(f"Degree histogram (updated): {graph['degree_histograms']['graph']}")
 
 ### Connected components (& add component labels to edges gdf)
-print(f"The number of connected components is: {nx.number_connected_components(G)}")
-comps = [c for c in nx.connected_components(G)]
-comps = sorted(comps, key=len, reverse=True)  # sort by length (LCC first)
-i = 1  # component count (starting to count at 1)
-for comp in comps:
-
-    # for each component, make subgraph
-    G_sub = nx.subgraph(G, nbunch=comp)
-
-    # if subgraph has at least 1 edge:
-    assert len(G_sub.edges) > 0, "Component has no edges"
-
-    G_sub_edges = [G_sub.edges[e]["edge_id"] for e in G_sub.edges]
-    edges.loc[edges.edge_id.isin(G_sub_edges), "component"] = int(i)
-    i += 1
+node_components, edge_components = label_components(
+    nodes, edges, graph["adjacency"]
+)
+comps_count = int(node_components.max()) if len(node_components) else 0
+print(f"The number of connected components is: {comps_count}")
+edges["component"] = edge_components
 
 # Export edges, nodes, and graph
 if os.path.exists(filepath_edge_output):
@@ -109,26 +84,24 @@ if os.path.exists(filepath_node_output):
 edges.to_file(filepath_edge_output, mode="w")
 nodes.to_file(filepath_node_output, mode="w")
 
-with open(graph_file, "wb") as f:
-    pickle.dump(G, f, pickle.HIGHEST_PROTOCOL)
+export_network_graph(graph, graph_file)
 
-### save comp edges as SEPARATE files (for plotting)
+### save comp edges as ONE file with a component attribute (for plotting)
+# remove per-component files of previous versions, if any
 comppath = homepath + "/data/output/network/components/"
-# first remove pre-existing files if any
 if os.path.exists(comppath):
-    shutil.rmtree(fp)
-    os.makedirs(comppath, exist_ok=True)
+    shutil.rmtree(comppath)
+if os.path.exists(filepath_components_output):
+    os.remove(filepath_components_output)
+edges.to_file(filepath_components_output, mode="w")
 
-comps_index = []
-for comp, group in edges.groupby("component"):
-    comps_index.append(int(comp))
-    group.copy().reset_index(drop=True).to_file(comppath + f"{int(comp)}.gpkg")
+comps_index = list(range(1, comps_count + 1))
 
 ### Summary statistics of network
 res = {}  # initialize stats results dictionary
-res["node_count"] = len(G.nodes)
-res["edge_count"] = len(G.edges)
-res["components"] = len(comps)
+res["node_count"] = len(nodes)
+res["edge_count"] = len(edges)
+res["components"] = comps_count
 # res["node_degrees"] = dict(nx.degree(G))
 
 with open(stats_path, "w") as opened_file:
@@ -136,39 +109,34 @@ with open(stats_path, "w") as opened_file:
 print(f"Network statistics saved to {stats_path}")
 
 ### Visualization
+
+# colors (one for every comp) from seaborn colorblind palette; only the largest
+# len(palette) comps get their own category in QGIS (all others are grey) and their own plot
+palette = sns.color_palette("colorblind")
+comps_plotted = comps_index[: len(palette)]
+comp_colors = {}
+comp_colors_hex = {}
+for k, v in zip(comps_plotted, palette):
+    comp_colors[k] = (
+        str([int(rgba * 255) for rgba in v]).replace("[", "").replace("]", "")
+    )
+    comp_colors_hex[k] = v
+
 remove_existing_layers(["Edges (beta)", "Nodes (beta)", "Input edges", "Input nodes"])
 
 if display_disconnected_components:
 
     remove_existing_layers(["Component"])
 
-    comp_layer_names = []
-
-    # create random colors (one for every comp) from seaborn colorblind palette
-    layercolors = sns.color_palette("colorblind", len(comps_index))
-    comp_colors = {}
-    comp_colors_hex = {}
-    for k, v in zip(comps_index, layercolors):
-        comp_colors[k] = (
-            str([int(rgba * 255) for rgba in v]).replace("[", "").replace("]", "")
-        )
-        comp_colors_hex[k] = v
-
-    for comp in comps_index:
-
-        comp_layer_name = f"Component {str(comp)}"
-        comp_layer = QgsVectorLayer(comppath + f"{comp}.gpkg", comp_layer_name, "ogr")
-
-        QgsProject.instance().addMapLayer(comp_layer)
-
-        draw_simple_line_layer(comp_layer_name, color=comp_colors[comp], line_width=1)
-
-        comp_layer_names.append(comp_layer_name)
+    comp_layer_name = "Disconnected components"
+    comp_layer = QgsVectorLayer(filepath_components_output, comp_layer_name, "ogr")
+    QgsProject.instance().addMapLayer(comp_layer)
+    draw_components_layer(comp_layer_name, comp_colors, line_width=1)
 
     group_name = "4 Connected components"
     group_layers(
         group_name=group_name,
-        layer_names=comp_layer_names,
+        layer_names=[comp_layer_name],
         remove_group_if_exists=True,
     )
 
@@ -194,21 +162,27 @@ group_names.remove(group_name)
 for gn in group_names:
     collapse_layer_group(gn)
 
-# make matplotlib plots of each component
+# make matplotlib plots of the largest components
+# (first remove plots of previous runs, if any)
+plotpath = homepath + "/results/plots/"
+os.makedirs(plotpath, exist_ok=True)
+for f in os.listdir(plotpath):
+    if f.startswith("component") and f.endswith(".png"):
+        os.remove(plotpath + f)
 
-for comp in comps_index:
-    gdf = gpd.read_file(comppath + f"{comp}.gpkg")
+for comp in comps_plotted:
+    gdf = edges[edges["component"] == comp]
     fig, ax = plt.subplots(1, 1)
     gdf.plot(ax=ax, color=comp_colors_hex[comp])
     ax.set_axis_off()
     ax.set_title(f"Component nr {comp}")
     cx.add_basemap(ax=ax, source=cx.providers.CartoDB.Voyager, crs=gdf.crs)
     fig.savefig(
-        homepath + f"/results/plots/component{comp}.png",
+        plotpath + f"component{comp}.png",
         dpi=300,
         bbox_inches="tight",
     )
     plt.close()
 
-print(f"Component plots saved to {homepath}/results/plots/")
+print(f"Plots of the {len(comps_plotted)} largest components saved to {plotpath}")
 print("script04.py ended successfully.")
\ No newline at end of file
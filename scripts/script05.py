@@ -42,6 +42,7 @@ display_edge_lengths = config_display["display_edge_lengths"]
 # load custom functions
 exec(open(homepath + "/src/plot_func.py").read())
 exec(open(homepath + "/src/eval_func.py").read())
+exec(open(homepath + "/src/network_func.py").read())
 
 # INPUT/OUTPUT FILE PATHS
 
@@ -54,29 +55,14 @@ for fp in [
 
 # input
 filepath_edges_input = homepath + "/data/input/network/processed/edges.gpkg"
+graph_cache_dir = homepath + "/data/output/network/graph_cache/"
 
 # output
 topo_folder = homepath + "/data/output/network/topology/"
 
-# load data
-edges_in = gpd.read_file(filepath_edges_input)
-
-# convert to networkx object with momepy
-G = momepy.gdf_to_nx(
-    gdf_network=edges_in,
-    multigraph=False,
-    #    integer_labels=True, # only in momepy 0.8+
-    directed=False,
-)
-
-# remove degree 0 nodes
-degree_histogram = nx.degree_histogram(G)
-nodes_to_remove = [node for node in G.nodes if nx.degree(G, node) == 0]
-G.remove_nodes_from(nodes_to_remove)
-degree_histogram = nx.degree_histogram(G)
-
-# using momepy to get nodes and edges gdf with corresponding labels and geometry objects
-nodes, edges = momepy.nx_to_gdf(net=G, points=True, lines=True)
+# load network graph (only rebuilt if input edges have changed since last run)
+graph = load_network_graph(filepath_edges_input, graph_cache_dir)
+nodes, edges = graph["nodes"], graph["edges"]
 
 # ### Visualization
 remove_existing_layers(
@@ -105,6 +105,13 @@ if os.path.exists(homepath + "/data/output/elevation/edges_slope.gpkg"):
         print("Plotted slopes")
     except:
         print("Failed to plot slopes, passing")
+    try:
+        # summary statistics only (per-segment arrays are loaded lazily, if needed)
+        slope_stats = load_slope_stats(homepath)
+        plot_slope_histogram(homepath, slope_stats)
+        print("Plotted slope histogram")
+    except:
+        print("Failed to plot slope histogram, passing")
 
 ### COMPONENTS (OUTPUT OF SCRIPT04)
 try:
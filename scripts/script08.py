@@ -63,12 +63,7 @@ layout_dict = {
     ],
 }
 
-# add all component layers to the list of layers
-all_layers = QgsProject.instance().mapLayers().values()
-component_layer_names = [
-    layer.name() for layer in all_layers if "Component" in layer.name()
-]
-layout_dict["disconnected_components"] = component_layer_names + ["Basemap"]
+layout_dict["disconnected_components"] = ["Basemap", "Disconnected components"]
 
 # Define map extent and ratio
 layers_for_plotting = []
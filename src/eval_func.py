@@ -1,9 +1,14 @@
 # import libraries
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 os.environ["USE_PYGEOS"] = "0"  # pygeos/shapely2.0/osmnx conflict solving
+import numpy as np
 import geopandas as gpd
 import pandas as pd
+import shapely
+from scipy import ndimage, sparse
+from scipy.sparse import csgraph
 from shapely import strtree
 
 
@@ -39,6 +44,33 @@ def merge_municipalities(
     return None
 
 
+def read_file_chunks(input_fp, chunk_size=None):
+    """
+    Read a vector layer from file, either at once or in consecutive chunks
+
+    Arguments:
+        input_fp (str): filepath of the vector layer
+        chunk_size (int): max number of rows per chunk; if None, the whole layer is read at once
+
+    Yields:
+        gdf with (at most chunk_size) rows of the layer; at least one (possibly empty) gdf is yielded
+    """
+    if not chunk_size:
+        yield gpd.read_file(input_fp)
+        return
+
+    # read the feature ids once (without attributes and geometries), and then each chunk by its ids,
+    # so that every chunk is fetched directly instead of skipping over all preceding rows
+    fids = gpd.read_file(
+        input_fp, columns=[], read_geometry=False, fid_as_index=True
+    ).index.values
+    if len(fids) == 0:
+        yield gpd.read_file(input_fp)
+        return
+    for start in range(0, len(fids), chunk_size):
+        yield gpd.read_file(input_fp, fids=fids[start : start + chunk_size])
+
+
 def evaluate_export_plot_point(
     input_fp,
     within_reach_output_fp,
@@ -52,6 +84,11 @@ def evaluate_export_plot_point(
     output_size_not_reached=3,
     output_alpha="255",
     display_output=True,
+    engine="buffer",
+    incidence_output_fp=None,
+    network_nodes=None,
+    chunk_size=None,
+    session=None,
 ):
     """
     Find points reachable from network edges, export reachable and unreachable points and plot results
@@ -61,12 +98,25 @@ def evaluate_export_plot_point(
         within_reach_output_fp (str): filepath for storing points within reach
         outside_reach_output_fp (str): filepath for storing points outside reach
         network_edges (gdf): network edges as GeoDataFrame
-        dist (numeric): max distance for points to be reachable (in meters)
+        dist (numeric or list of numeric): max distance for points to be reachable (in meters);
+            if a list is given, the first value is used for the exported layers and the reach curve is computed for all values
         name (str): label/name for points layer (used for layer naming and print statements)
         output_size_reached (numerical): marker size when plotting reachable points
         output_size_not_reached (numerical): marker size when plotting non-reachable points
         output_alpha (numerical): value between 0 and 255 setting the transparency of reachable and non-reachable points
         display_output (bool): If True, plots reachable and non reachable points
+        engine (str): "buffer" (points intersecting the dissolved edge buffers are within reach)
+            or "distance" (distance to nearest edge from a spatial index query, adds column "dist_to_network")
+            or "network" (distance to nearest node along the network, adds columns "dist_to_network" and "dist_via_network")
+        incidence_output_fp (str): filepath (without extension) for storing the point x edge incidence
+            as sparse matrix (.npz) and long-format table (.csv); if None, the incidence is not computed
+        network_nodes (gdf): network nodes (knudepunkter) used as origins by the "network" engine;
+            if None, all edge endpoints are used
+        chunk_size (int): if given, the point layer is read, evaluated and exported in chunks of at most
+            chunk_size rows, so that memory use does not depend on the size of the layer
+            (the network index is built only once; the incidence is only saved as .csv)
+        session (EvaluationSession): network prepared for evaluation, shared between layers;
+            if None, a new one is created from network_edges and network_nodes
     Returns:
         input_layer_name (str), output_layer_name_within (str), output_layer_name_outside (str):
         Returns names of plotted layers with input, non-reachable points and reachable points
@@ -74,65 +124,189 @@ def evaluate_export_plot_point(
         res (dict): summary statistics of evaluation results
     """
 
-    # import layer
-    input_points = gpd.read_file(input_fp)
-
-    # evaluate
-    evaluated_points = evaluate_point_layer(input_points, network_edges, dist)
-    print(f"{name} layer evaluated")
+    # the first distance threshold is used for the within/outside layers;
+    # all of them are used for the reach curve (which needs point distances)
+    thresholds = dist if isinstance(dist, list) else [dist]
+    dist = thresholds[0]
+    if len(thresholds) > 1 and engine == "buffer":
+        print(f"Several distance thresholds given for {name}, using distance engine")
+        engine = "distance"
+    if engine not in ["buffer", "distance", "network"]:
+        raise ValueError(f"Unknown point evaluation engine: {engine}")
+
+    # prepare network once (for all chunks), unless already done for previous layers
+    if session is None:
+        session = EvaluationSession(network_edges, network_nodes)
+    network_index = session.network_index
+    if engine == "network":
+        network_index = session.node_distances()
+
+    # initialize counts (summed up over all chunks)
+    count_total = 0
+    count_within = 0
+    count_outside = 0
+    count_pairs = 0
+    point_offset = 0
+    reach_curve = None
+
+    # import layer (at once, or in chunks of chunk_size rows)
+    for i, input_points in enumerate(read_file_chunks(input_fp, chunk_size)):
+
+        # evaluate
+        if engine == "buffer":
+            evaluated_points = evaluate_point_layer(
+                input_points,
+                network_edges,
+                dist,
+                edges_buff_area=session.edge_buffer_union(dist),
+            )
+        elif engine == "distance":
+            evaluated_points = evaluate_point_layer_distance(
+                input_points, network_edges, dist, network_index=network_index
+            )
+        elif engine == "network":
+            evaluated_points = evaluate_point_layer_network(
+                input_points, network_edges, dist, network_index=network_index
+            )
 
-    points_withinreach = evaluated_points.loc[evaluated_points.withinreach == 1]
-    print(
-        f"Out of {len(input_points)} {name.lower()} points, {len(points_withinreach)} {name.lower()} ({(len(points_withinreach) / len(input_points))*100:.2f}%) are within reach"
-    )
+        points_withinreach = evaluated_points.loc[evaluated_points.withinreach == 1]
+        points_outsidereach = evaluated_points.loc[evaluated_points.withinreach == 0]
 
-    # export
-    points_withinreach.to_file(within_reach_output_fp)
+        # export (first chunk creates the files, all other non-empty chunks are appended)
+        if i == 0:
+            points_withinreach.to_file(within_reach_output_fp)
+            points_outsidereach.to_file(outside_reach_output_fp)
+        else:
+            if len(points_withinreach) > 0:
+                points_withinreach.to_file(within_reach_output_fp, mode="a")
+            if len(points_outsidereach) > 0:
+                points_outsidereach.to_file(outside_reach_output_fp, mode="a")
+
+        if incidence_output_fp is not None:
+            incidence_matrix, incidence_table = compute_point_edge_incidence(
+                input_points, network_edges, dist, network_index=network_index
+            )
+            # point_index refers to the position in the entire (exploded) layer
+            incidence_table["point_index"] += point_offset
+            incidence_table.to_csv(
+                incidence_output_fp + ".csv",
+                index=False,
+                mode="w" if i == 0 else "a",
+                header=i == 0,
+            )
+            # the sparse matrix is only saved if the layer is read at once
+            if not chunk_size:
+                sparse.save_npz(incidence_output_fp + ".npz", incidence_matrix)
+            count_pairs += len(incidence_table)
+
+        if engine != "buffer":
+            reach_col = "dist_via_network" if engine == "network" else "dist_to_network"
+            reach_curve_chunk = compute_reach_curve(
+                evaluated_points[reach_col].values, thresholds
+            )
+            if reach_curve is None:
+                reach_curve = reach_curve_chunk
+            else:
+                for t, v in reach_curve_chunk.items():
+                    reach_curve[t]["within"] += v["within"]
+                    reach_curve[t]["outside"] += v["outside"]
+
+        count_total += len(input_points)
+        count_within += len(points_withinreach)
+        count_outside += len(points_outsidereach)
+        point_offset += len(evaluated_points)
 
-    evaluated_points.loc[evaluated_points.withinreach == 0].to_file(
-        outside_reach_output_fp
+    print(f"{name} layer evaluated")
+    print(
+        f"Out of {count_total} {name.lower()} points, {count_within} {name.lower()} ({(count_within / count_total)*100:.2f}%) are within reach"
     )
+    if incidence_output_fp is not None:
+        print(f"{name} incidence saved: {count_pairs} point-edge pairs within {dist}m")
 
     # stats to dict
     res = {}
     res[name] = {}
     res[name]["type"] = "point_layer"
+    res[name]["engine"] = engine
     res[name]["dist"] = dist
-    res[name]["total"] = len(input_points)
-    res[name]["within"] = len(points_withinreach)
-    res[name]["outside"] = len(evaluated_points.loc[evaluated_points.withinreach == 0])
+    res[name]["total"] = count_total
+    res[name]["within"] = count_within
+    res[name]["outside"] = count_outside
+    if reach_curve is not None:
+        # shares from the counts summed up over all chunks
+        for v in reach_curve.values():
+            count_points = v["within"] + v["outside"]
+            v["share"] = float(v["within"] / count_points) if count_points else 0.0
+        res[name]["reach_curve"] = reach_curve
 
     output_layer_name_within = None
     output_layer_name_outside = None
 
     if display_output:
-        output_layer_name_outside = f"{name.title()} outside reach"
-        vlayer_outside = QgsVectorLayer(
-            outside_reach_output_fp, output_layer_name_outside, "ogr"
-        )
-        QgsProject.instance().addMapLayer(vlayer_outside)
-        draw_simple_point_layer(
-            output_layer_name_outside,
-            color=output_color_not_reached + "," + output_alpha,
-            marker_size=output_size_not_reached,
-            outline_width=0,
-        )
-
-        output_layer_name_within = f"{name.title()} within reach"
-        vlayer_within = QgsVectorLayer(
-            within_reach_output_fp, output_layer_name_within, "ogr"
-        )
-        QgsProject.instance().addMapLayer(vlayer_within)
-        draw_simple_point_layer(
-            output_layer_name_within,
-            color=output_color_reached + "," + output_alpha,
-            marker_size=output_size_reached,
-            outline_width=0,
+        output_layer_name_within, output_layer_name_outside = display_point_evaluation(
+            within_reach_output_fp,
+            outside_reach_output_fp,
+            name,
+            output_color_reached=output_color_reached,
+            output_color_not_reached=output_color_not_reached,
+            output_size_reached=output_size_reached,
+            output_size_not_reached=output_size_not_reached,
+            output_alpha=output_alpha,
         )
 
     return output_layer_name_within, output_layer_name_outside, res
 
 
+def display_point_evaluation(
+    within_reach_output_fp,
+    outside_reach_output_fp,
+    name,
+    output_color_reached="255, 0, 0",
+    output_color_not_reached="255, 0, 0",
+    output_size_reached=3,
+    output_size_not_reached=3,
+    output_alpha="255",
+):
+    """
+    Plot the reachable and non reachable points exported by evaluate_export_plot_point in QGIS
+
+    Arguments:
+        within_reach_output_fp (str): filepath of points within reach
+        outside_reach_output_fp (str): filepath of points outside reach
+        name (str): label/name for points layer (used for layer naming)
+        output_size_reached (numerical): marker size when plotting reachable points
+        output_size_not_reached (numerical): marker size when plotting non-reachable points
+        output_alpha (numerical): value between 0 and 255 setting the transparency of reachable and non-reachable points
+    Returns:
+        output_layer_name_within (str), output_layer_name_outside (str): names of plotted layers
+    """
+    output_layer_name_outside = f"{name.title()} outside reach"
+    vlayer_outside = QgsVectorLayer(
+        outside_reach_output_fp, output_layer_name_outside, "ogr"
+    )
+    QgsProject.instance().addMapLayer(vlayer_outside)
+    draw_simple_point_layer(
+        output_layer_name_outside,
+        color=output_color_not_reached + "," + output_alpha,
+        marker_size=output_size_not_reached,
+        outline_width=0,
+    )
+
+    output_layer_name_within = f"{name.title()} within reach"
+    vlayer_within = QgsVectorLayer(
+        within_reach_output_fp, output_layer_name_within, "ogr"
+    )
+    QgsProject.instance().addMapLayer(vlayer_within)
+    draw_simple_point_layer(
+        output_layer_name_within,
+        color=output_color_reached + "," + output_alpha,
+        marker_size=output_size_reached,
+        outline_width=0,
+    )
+
+    return output_layer_name_within, output_layer_name_outside
+
+
 def evaluate_export_plot_poly(
     input_fp,
     output_fp,
@@ -150,6 +324,10 @@ def evaluate_export_plot_poly(
     outline_alpha="200",
     display_output=True,
     display_input=True,
+    session=None,
+    engine="union",
+    max_vertices=None,
+    resolution=10,
 ):
     """
     Find intersection between network edges and polygon layer, export intersection and plot outcome
@@ -158,7 +336,9 @@ def evaluate_export_plot_poly(
         input_fp (str): Filepath to polygon layer
         output_fp (str): Filepath for storing intersecting edges
         network_edges (gdf): Network edges
-        dist (numeric): Distance to use for buffering polygons
+        dist (numeric or list of numeric): Distance to use for buffering polygons; if a list is given,
+            the first distance is used for the output layer, and the share of the network within
+            each distance is saved as buffer curve in the stats
         name (str): Name of polygon layer (used for layer naming and print statements)
         type_col (str): Name of column in polygon layer with sub-category/type
         fill_color_rgb (str): String with RGB values for the fill color used for plotting the input polygons
@@ -171,23 +351,71 @@ def evaluate_export_plot_poly(
         outline_alpha (str): String with value between 0 and 255 setting the transparency of the polygon outline
         display_output (bool): If True, plot the intersecting network edges
         display_input (bool): If True, plot the input polygons
+        session (EvaluationSession): network prepared for evaluation, shared between layers;
+            if None, the network edges are prepared for this layer only
+        engine (str): "union" (edges are intersected with the union of all buffered polygons)
+            or "local" (edges are intersected only with the polygons they touch, no union of all polygons)
+            or "raster" (polygons are rasterized and network lengths estimated on the grid, see evaluate_polygon_layer_raster)
+        max_vertices (int): if given, buffered polygons with more vertices are split into smaller pieces before evaluation
+        resolution (numeric): Cell size (m) of the grid used by the "raster" engine
     Returns:
         input_layer_name (str), output_layer_name (str):
         Returns names of plotted layers with input and output (intersecting edges)
         If the display of a layer is set to False, None is returned instead of the layer name
     """
+    # the first buffer distance is used for the output layer;
+    # all of them are used for the buffer curve (from segment distances, no buffering)
+    thresholds = dist if isinstance(dist, list) else [dist]
+    dist = thresholds[0]
+
     # import layer
     input_poly = gpd.read_file(input_fp)
 
+    # prepare network, unless already done for previous layers
+    if session is None:
+        session = EvaluationSession(network_edges)
+
     # evaluate
-    evaluate_network, evaluate_area = evaluate_polygon_layer(
-        input_poly, network_edges, dist
-    )
+    raster_error = None
+    if engine == "raster":
+        (
+            evaluate_network,
+            evaluate_area,
+            evaluate_type_lengths,
+            raster_error,
+        ) = evaluate_polygon_layer_raster(
+            input_poly,
+            network_edges,
+            dist,
+            resolution=resolution,
+            network_index=session.network_index,
+        )
+    else:
+        evaluate_network, evaluate_area, evaluate_type_lengths = evaluate_polygon_layer(
+            input_poly,
+            network_edges,
+            dist,
+            network_index=session.network_index,
+            engine=engine,
+            type_lengths=True,
+            max_vertices=max_vertices,
+        )
+
+    # network lengths (total length computed once per session)
+    network_summary = session.network_summary()
+    length_total = network_summary["length"]
+    length_within = network_length(evaluate_network, network_summary)
 
     print(f"{name} areas evaluated")
     print(
-        f"{evaluate_network.unary_union.length / 1000:.2f} out of {network_edges.unary_union.length / 1000:.2f} km ({(evaluate_network.unary_union.length / network_edges.unary_union.length)*100:.2f}%) of the network go through {name.lower()} areas."
+        f"{length_within / 1000:.2f} out of {length_total / 1000:.2f} km ({(length_within / length_total)*100:.2f}%) of the network go through {name.lower()} areas."
     )
+    for t, l in evaluate_type_lengths["type"].items():
+        print(f"\t{l / 1000:.2f} km in {t} areas")
+    if raster_error is not None:
+        print(
+            f"\t(estimated on a {resolution} m grid: expected error {raster_error['expected'] / 1000:.2f} km, {raster_error['uncertain'] / 1000:.2f} km close to area boundaries)"
+        )
 
     # export
     evaluate_network.to_file(output_fp)
@@ -196,20 +424,84 @@ def evaluate_export_plot_poly(
     res = {}
     res[name] = {}
     res[name]["type"] = "polygon_layer"
+    res[name]["engine"] = engine
     res[name]["dist"] = dist
-    res[name]["total"] = network_edges.unary_union.length  # area covered by layer
-    res[name][
-        "within"
-    ] = evaluate_network.unary_union.length  # length of edges intersecting
-    res[name]["outside"] = (
-        network_edges.unary_union.length - evaluate_network.unary_union.length
-    )  # length of edges not intersecting
+    res[name]["total"] = length_total  # area covered by layer
+    res[name]["within"] = length_within  # length of edges intersecting
+    res[name]["outside"] = length_total - length_within  # length of edges not intersecting
     res[name]["area"] = evaluate_area
+    res[name]["within_by_type"] = evaluate_type_lengths["type"]
+    res[name]["within_by_type_combination"] = evaluate_type_lengths["type_combination"]
+    if raster_error is not None:
+        res[name]["raster_error"] = raster_error
+    if len(thresholds) > 1:
+        res[name]["buffer_curve"] = compute_buffer_curve(
+            input_poly, network_edges, thresholds, network_index=session.network_index
+        )
 
+    # plot
+    input_layer_name, output_layer_name = display_polygon_evaluation(
+        input_fp,
+        output_fp,
+        name,
+        type_col,
+        fill_color_rgb,
+        outline_color_rgb,
+        line_color_rgb,
+        line_width=line_width,
+        line_style=line_style,
+        plot_categorical=plot_categorical,
+        fill_alpha=fill_alpha,
+        outline_alpha=outline_alpha,
+        display_output=display_output,
+        display_input=display_input,
+    )
+
+    return input_layer_name, output_layer_name, res
+
+
+def display_polygon_evaluation(
+    input_fp,
+    output_fp,
+    name,
+    type_col,
+    fill_color_rgb,
+    outline_color_rgb,
+    line_color_rgb,
+    line_width=1,
+    line_style="solid",
+    plot_categorical=False,
+    fill_alpha="100",
+    outline_alpha="200",
+    display_output=True,
+    display_input=True,
+):
+    """
+    Plot the input polygons and the intersecting edges exported by evaluate_export_plot_poly in QGIS
+
+    Arguments:
+        input_fp (str): Filepath to polygon layer
+        output_fp (str): Filepath of intersecting edges
+        name (str): Name of polygon layer (used for layer naming)
+        type_col (str): Name of column in polygon layer with sub-category/type
+        fill_color_rgb (str): String with RGB values for the fill color used for plotting the input polygons
+        outline_color_rgb (str): String with RGB values for the outline color used for plotting the input polygons
+        line_color_rgb (str):  String with RGB values for the color used for plotting intersecting network
+        line_width (numerical): Line width when plotting the intersecting network
+        line_style (str): Plot style for plotting intersecting network (e.g. "solid" or "dash")
+        plot_categorical (bool): If True, plots the intersecting edges using a categorical plotting based on the type of intersecting polygon
+        fill_alpha (str): String with value between 0 and 255 setting the transparency of the polygon fill
+        outline_alpha (str): String with value between 0 and 255 setting the transparency of the polygon outline
+        display_output (bool): If True, plot the intersecting network edges
+        display_input (bool): If True, plot the input polygons
+    Returns:
+        input_layer_name (str), output_layer_name (str):
+        Returns names of plotted layers with input and output (intersecting edges)
+        If the display of a layer is set to False, None is returned instead of the layer name
+    """
     input_layer_name = None
     output_layer_name = None
 
-    # plot
     if display_input:
         input_layer_name = f"{name.title()} areas"
 
@@ -240,53 +532,104 @@ def evaluate_export_plot_poly(
                 line_style=line_style,
             )
 
-    return input_layer_name, output_layer_name, res
+    return input_layer_name, output_layer_name
 
 
-def evaluate_polygon_layer(poly, edges, polygon_buffer=100):
+def evaluate_polygon_layer(
+    poly,
+    edges,
+    polygon_buffer=100,
+    network_index=None,
+    engine="union",
+    type_lengths=False,
+    max_vertices=None,
+):
     """
     find out where study_area linestrings intersect with a given
     polygon layer. linestrings are buffered with a default of 100m.
     both input gdfs must be in the same projected CRS.
     keep track of which, and how many, types (from poly layer)
     each of the edge segments intersects with (to track variation).
+    a prebuilt network_index (see build_network_index) can be passed
+    to reuse the already exploded edges.
+    engine "union" intersects all edges with the union of all buffered polygons;
+    engine "local" intersects each edge only with the union of the polygons it touches
+    (see intersect_polygon_groups) and computes the surface with a tiled
+    dissolve (see dissolved_area), without ever building the union of all polygons.
+    if max_vertices is given, buffered polygons with more vertices are split into
+    smaller pieces before indexing (see subdivide_polygons); the pieces of a
+    polygon do not overlap, and edges are intersected with their union.
     returns
         gdf of intersecting edge segments
         surface (sqm) of evaluation area
+        if type_lengths is True: dict with length of network (in m) within
+            the polygons of each type ("type") and in the edge segments of
+            each type combination ("type_combination"), see compute_type_lengths
     """
 
     assert poly.crs == edges.crs, "CRS of input layers do not match!"
 
     # explode edges
-    edges = edges.explode(index_parts=False)
+    if network_index is None:
+        edges = edges.explode(index_parts=False)
+    else:
+        edges = network_index["edges"].copy()
 
-    # buffer polygons
+    # buffer polygons (on a copy, the input layer is not changed)
+    poly = poly.copy()
     poly["geometry"] = poly.buffer(polygon_buffer)
-    poly_area = poly.unary_union
+
+    # split complex buffered polygons (together, the pieces cover the buffered polygon)
+    if max_vertices:
+        poly = subdivide_polygons(poly, max_vertices)
 
     # strtree query to find which edge intersects with which type of polygon
     # (to check for variation)
 
-    # make strtree of edge geoms
-    mytree = strtree.STRtree(geoms=poly.geometry)
-    type_inter = []  # list to add as column after for-loop
-
-    # for each polygon,
-    for ix, row in edges.iterrows():
-        # find intersection of polygon with edges
-        q = mytree.query(row.geometry, predicate="intersects")
-        # combining all unique (cf set()), sorted types in a string (so hashable)
-        types = ""
-        for t in sorted(list(set(poly.loc[q, "type"]))):
-            types += t + "_"  # adding _ after each type (to count)
-        type_inter.append(types)  # append to list of sets
+    # make strtree of polygon geoms
+    mytree = strtree.STRtree(geoms=poly.geometry.values)
+
+    # find all (edge, polygon) intersections in one query
+    edge_idx, poly_idx = mytree.query(edges.geometry.values, predicate="intersects")
+    edge_types = pd.DataFrame(
+        {"edge": edge_idx, "type": poly["type"].values[poly_idx]}
+    ).drop_duplicates()
+
+    # for each edge, combine all unique, sorted types in a string (so hashable),
+    # adding _ after each type (to count)
+    edge_types = edge_types.sort_values(["edge", "type"])
+    edge_types["type"] = edge_types["type"] + "_"
+    types_per_edge = edge_types.groupby("edge")["type"].agg("".join)
+
+    type_inter = np.full(len(edges), "", dtype=object)
+    type_inter[types_per_edge.index.values] = types_per_edge.values
 
     edges["type_inter"] = type_inter
-    edges["type_count"] = edges.apply(lambda x: x.type_inter.count("_"), axis=1)
+    edges["type_count"] = edges["type_inter"].str.count("_")
 
     # we already know with what "type" of polygon they intersect;
     # now we find the geometries of the intersections:
-    geoms_inter = edges.intersection(poly_area)
+    if engine == "union":
+        poly_area = poly.unary_union
+        geoms_inter = edges.intersection(poly_area)
+        area = poly_area.area
+    elif engine == "local":
+        # intersect each edge with the union of the polygons it touches
+        geoms_inter = gpd.GeoSeries(
+            intersect_polygon_groups(
+                edges.geometry.values,
+                edge_idx,
+                poly.geometry.values[poly_idx],
+                edge_idx,
+                len(edges),
+            ),
+            index=edges.index,
+            crs=edges.crs,
+        )
+        area = dissolved_area(poly.geometry.values)
+    else:
+        raise ValueError(f"Unknown polygon evaluation engine: {engine}")
+
     gdf_inter = gpd.GeoDataFrame(
         {
             "geometry": geoms_inter,
@@ -303,15 +646,542 @@ def evaluate_polygon_layer(poly, edges, polygon_buffer=100):
     # remove non-linestring geoms
     gdf_inter = gdf_inter[gdf_inter.type == "LineString"].reset_index(drop=True)
 
-    return gdf_inter, poly_area.area
+    if type_lengths:
+        return (
+            gdf_inter,
+            area,
+            compute_type_lengths(
+                edges.geometry.values,
+                edge_idx,
+                poly.geometry.values[poly_idx],
+                poly["type"].values[poly_idx],
+                gdf_inter,
+            ),
+        )
+
+    return gdf_inter, area
+
+
+def subdivide_polygons(poly, max_vertices=256, max_depth=50):
+    """
+    split polygons with more than max_vertices vertices into smaller pieces,
+    by recursively halving their bounding box along its longer side
+    (similar to ST_Subdivide in PostGIS). all pieces keep the attributes
+    of the polygon they belong to, and together cover the same area.
+    returns gdf of polygons (with a new index)
+    """
+    geoms = poly.geometry.values
+    rows = np.arange(len(poly))
+    geoms_done = []
+    rows_done = []
+
+    for _ in range(max_depth):
+        # polygons that are small enough are done
+        small = shapely.get_num_coordinates(geoms) <= max_vertices
+        geoms_done.append(geoms[small])
+        rows_done.append(rows[small])
+        geoms = geoms[~small]
+        rows = rows[~small]
+        if len(geoms) == 0:
+            break
+
+        # split all others in 2 halves
+        minx, miny, maxx, maxy = shapely.bounds(geoms).T
+        wide = (maxx - minx) >= (maxy - miny)
+        midx = (minx + maxx) / 2
+        midy = (miny + maxy) / 2
+        box1 = shapely.box(minx, miny, np.where(wide, midx, maxx), np.where(wide, maxy, midy))
+        box2 = shapely.box(np.where(wide, midx, minx), np.where(wide, miny, midy), maxx, maxy)
+        halves = np.concatenate(
+            [shapely.intersection(geoms, box1), shapely.intersection(geoms, box2)]
+        )
+
+        # keep polygonal parts only (cutting can create lines or points on the cut)
+        parts, part_idx = shapely.get_parts(halves, return_index=True)
+        polygonal = shapely.get_type_id(parts) == 3
+        geoms = parts[polygonal]
+        rows = np.concatenate([rows, rows])[part_idx][polygonal]
+
+    geoms_done.append(geoms)
+    rows_done.append(rows)
+
+    poly_subdivided = poly.iloc[np.concatenate(rows_done)].copy()
+    poly_subdivided["geometry"] = np.concatenate(geoms_done)
+    return poly_subdivided.reset_index(drop=True)
+
+
+def intersect_polygon_groups(lines, line_idx, polygons, group_idx, group_count):
+    """
+    intersect lines with the union of groups of polygons: pair i consists of
+    line line_idx[i] and polygons[i], and belongs to group group_idx[i]
+    (all pairs of a group have the same line). each line is intersected once
+    with the union of the polygons of its group, so that overlapping polygons
+    do not produce overlapping line pieces.
+    returns array of geometries (one per group; empty if a group has no pairs)
+    """
+    geoms = np.full(group_count, shapely.from_wkt("LINESTRING EMPTY"))
+    if len(group_idx) == 0:
+        return geoms
+
+    group_line = np.zeros(group_count, dtype=np.int64)
+    group_line[group_idx] = line_idx
+    group_polygons = np.full(group_count, None, dtype=object)
+
+    # groups with only 1 polygon
+    polygons_per_group = np.bincount(group_idx, minlength=group_count)
+    single = polygons_per_group[group_idx] == 1
+    group_polygons[group_idx[single]] = polygons[single]
+
+    # groups with several polygons: local union
+    if (~single).any():
+        polygons_dissolved = (
+            gpd.GeoDataFrame({"group": group_idx[~single]}, geometry=polygons[~single])
+            .dissolve(by="group")
+            .geometry
+        )
+        group_polygons[polygons_dissolved.index.values] = polygons_dissolved.values
+
+    has_pairs = polygons_per_group > 0
+    geoms[has_pairs] = shapely.intersection(
+        lines[group_line[has_pairs]], group_polygons[has_pairs]
+    )
+    return geoms
+
+
+def compute_type_lengths(edge_geoms, edge_idx, pair_polygons, pair_types, gdf_inter):
+    """
+    break down the network length (in m) within a polygon layer by polygon type:
+        "type": length within the (buffered) polygons of each type; each edge
+            is intersected with the union of the polygons of each type it touches
+            (see intersect_polygon_groups), so that overlapping polygons of the
+            same type are counted once (a segment within polygons of several
+            types counts for each of them)
+        "type_combination": length of the edge segments returned by
+            evaluate_polygon_layer for each type combination (column "types")
+    edge_idx, pair_polygons and pair_types describe the (edge, polygon) pairs
+    that intersect (edge index, polygon geometry and polygon type).
+    returns dict
+    """
+    type_lengths = {"type": {}, "type_combination": {}}
+
+    if len(edge_idx) > 0:
+        groups = pd.DataFrame({"edge": edge_idx, "type": pair_types})
+        group_idx = groups.groupby(["edge", "type"], sort=False).ngroup().values
+        group_count = group_idx.max() + 1
+        group_types = np.empty(group_count, dtype=object)
+        group_types[group_idx] = pair_types
+        group_lengths = shapely.length(
+            intersect_polygon_groups(
+                edge_geoms, edge_idx, pair_polygons, group_idx, group_count
+            )
+        )
+        type_lengths["type"] = {
+            str(t): float(l)
+            for t, l in pd.Series(group_lengths).groupby(group_types).sum().items()
+        }
+
+    type_lengths["type_combination"] = {
+        str(t): float(l)
+        for t, l in gdf_inter.length.groupby(gdf_inter["types"]).sum().items()
+    }
+
+    return type_lengths
+
+
+def dissolved_area(geoms, max_geoms_per_tile=500):
+    """
+    surface (sqm) of the union of (possibly overlapping) polygons, computed
+    tile by tile: the polygons are clipped to a regular grid of tiles
+    (with about max_geoms_per_tile polygons per tile), dissolved per tile,
+    and the (non-overlapping) tile surfaces are summed up.
+    """
+    geoms = geoms[~shapely.is_empty(geoms)]
+    if len(geoms) == 0:
+        return 0.0
+
+    tiles_per_axis = max(1, int(np.ceil(np.sqrt(len(geoms) / max_geoms_per_tile))))
+    minx, miny, maxx, maxy = shapely.total_bounds(geoms)
+    xs = np.linspace(minx, maxx, tiles_per_axis + 1)
+    ys = np.linspace(miny, maxy, tiles_per_axis + 1)
+
+    mytree = strtree.STRtree(geoms=geoms)
+    area = 0.0
+    for i in range(tiles_per_axis):
+        for j in range(tiles_per_axis):
+            tile = shapely.box(xs[i], ys[j], xs[i + 1], ys[j + 1])
+            q = mytree.query(tile, predicate="intersects")
+            if len(q) > 0:
+                area += shapely.union_all(
+                    shapely.intersection(geoms[q], tile)
+                ).area
+
+    return area
+
+
+def rasterize_polygons(geoms, classes, bounds, resolution):
+    """
+    rasterize polygons onto a regular grid with a scanline fill
+    (a cell belongs to a polygon if the cell center lies within it),
+    with one bit per class: bit c of a cell is set if the cell is within
+    a polygon of class c (0 <= c < 32).
+    bounds (minx, miny, maxx, maxy) and resolution (cell size in m) define the grid;
+    row 0 is the southernmost row, column 0 the westernmost column.
+    runtime is proportional to the number of polygon vertices plus the number of cells.
+    returns 2d array (uint32) of rows x columns
+    """
+    minx, miny, maxx, maxy = bounds
+    # (rounded, so that bounds on the grid give an exact number of cells)
+    ncols = max(1, int(np.ceil(np.round((maxx - minx) / resolution, 6))))
+    nrows = max(1, int(np.ceil(np.round((maxy - miny) / resolution, 6))))
+    raster = np.zeros((nrows, ncols), dtype=np.uint32)
+
+    # all ring segments (x1, y1) -> (x2, y2), with the class of their polygon
+    parts, part_idx = shapely.get_parts(geoms, return_index=True)
+    rings, ring_part = shapely.get_rings(parts, return_index=True)
+    coords, coord_ring = shapely.get_coordinates(rings, return_index=True)
+    same_ring = coord_ring[:-1] == coord_ring[1:]
+    x1, y1 = coords[:-1][same_ring].T
+    x2, y2 = coords[1:][same_ring].T
+    seg_part = ring_part[coord_ring[:-1][same_ring]]
+
+    # rows whose cell centers are crossed by each segment (half-open, so that
+    # each ring crosses each row an even number of times)
+    row_first = np.ceil((np.minimum(y1, y2) - miny) / resolution - 0.5)
+    row_last = np.ceil((np.maximum(y1, y2) - miny) / resolution - 0.5)
+    row_first = np.clip(row_first, 0, nrows).astype(np.int64)
+    row_last = np.clip(row_last, 0, nrows).astype(np.int64)
+    rows_per_seg = row_last - row_first
+
+    # one crossing per (segment, row)
+    seg = np.repeat(np.arange(len(x1)), rows_per_seg)
+    rows = row_first[seg] + (
+        np.arange(len(seg)) - np.repeat(np.cumsum(rows_per_seg) - rows_per_seg, rows_per_seg)
+    )
+    yc = miny + (rows + 0.5) * resolution
+    xc = x1[seg] + (yc - y1[seg]) * (x2[seg] - x1[seg]) / (y2[seg] - y1[seg])
+    crossing_part = seg_part[seg]
+
+    # sorted by polygon part, row and x, consecutive crossings delimit
+    # the spans within the polygon part (even-odd rule, so holes are excluded)
+    order = np.lexsort((xc, rows, crossing_part))
+    span_start = order[0::2]
+    span_end = order[1::2]
+    span_rows = rows[span_start]
+    span_classes = classes[part_idx[crossing_part[span_start]]]
+    col_start = np.clip(np.ceil((xc[span_start] - minx) / resolution - 0.5), 0, ncols)
+    col_end = np.clip(np.ceil((xc[span_end] - minx) / resolution - 0.5), 0, ncols)
+    col_start = col_start.astype(np.int64)
+    col_end = col_end.astype(np.int64)
+
+    # fill spans class by class: +1 at span start, -1 at span end, cumulated per row
+    for c in np.unique(span_classes):
+        in_class = span_classes == c
+        flat_start = span_rows[in_class] * (ncols + 1) + col_start[in_class]
+        flat_end = span_rows[in_class] * (ncols + 1) + col_end[in_class]
+        diff = np.bincount(flat_start, minlength=nrows * (ncols + 1)) - np.bincount(
+            flat_end, minlength=nrows * (ncols + 1)
+        )
+        covered = np.cumsum(diff.reshape(nrows, ncols + 1)[:, :-1], axis=1) > 0
+        raster |= covered.astype(np.uint32) << np.uint32(c)
+
+    return raster
+
+
+def split_line_positions(lengths, max_length):
+    """
+    split lines into equal pieces of at most max_length (at least one piece per line)
+    returns, for each piece: index of its line, start position along the line, piece length
+    """
+    pieces_per_line = np.maximum(1, np.ceil(lengths / max_length)).astype(np.int64)
+    piece_line = np.repeat(np.arange(len(lengths)), pieces_per_line)
+    piece_nr = np.arange(len(piece_line)) - np.repeat(
+        np.cumsum(pieces_per_line) - pieces_per_line, pieces_per_line
+    )
+    piece_length = (lengths / pieces_per_line)[piece_line]
+    return piece_line, piece_nr * piece_length, piece_length
+
+
+def compute_buffer_curve(
+    poly, edges, thresholds, network_index=None, segment_length=10
+):
+    """
+    compute the buffer sensitivity curve of a polygon layer: for each buffer distance,
+    the length and share of the network within the buffered polygons.
+    edges are split into segments of at most segment_length (m), and the distance
+    of each segment end point to the nearest polygon is computed once (no buffering);
+    along each segment, the distance is interpolated linearly between its end points,
+    so lengths are accurate up to a fraction of segment_length per crossing of a buffer boundary.
+    both input gdfs must be in the same projected CRS.
+    returns
+        buffer_curve (dict): threshold -> {"within": float, "outside": float, "share": float}
+            (lengths in m), sorted by threshold
+    """
+
+    assert poly.crs == edges.crs, "CRS of input layers do not match!"
+
+    # explode edges
+    if network_index is None:
+        edges = edges.explode(index_parts=False)
+    else:
+        edges = network_index["edges"]
+    edge_geoms = edges.geometry.values
+
+    # start and end points of segments along the edges
+    seg_edge, seg_start, seg_length = split_line_positions(
+        shapely.length(edge_geoms), segment_length
+    )
+    seg_points = shapely.line_interpolate_point(
+        edge_geoms[np.concatenate([seg_edge, seg_edge])],
+        np.concatenate([seg_start, seg_start + seg_length]),
+    )
+
+    # distance of each point to the nearest polygon, up to the largest threshold
+    thresholds = sorted(set(thresholds))
+    tree = strtree.STRtree(geoms=poly.geometry.values)
+    (point_idx, _), point_dist = tree.query_nearest(
+        seg_points, max_distance=thresholds[-1], return_distance=True, all_matches=False
+    )
+    dist = np.full(len(seg_points), np.inf)
+    dist[point_idx] = point_dist
+    dist_start, dist_end = dist[: len(seg_edge)], dist[len(seg_edge) :]
+    dist_min = np.minimum(dist_start, dist_end)
+    dist_max = np.maximum(dist_start, dist_end)
+    length_total = seg_length.sum()
+
+    buffer_curve = {}
+    for t in thresholds:
+        # share of each segment at or below the threshold
+        with np.errstate(invalid="ignore", divide="ignore"):
+            share = np.clip((t - dist_min) / (dist_max - dist_min), 0, 1)
+        share[dist_max <= t] = 1
+        share[dist_min > t] = 0
+        within = (share * seg_length).sum()
+        buffer_curve[t] = {
+            "within": float(within),
+            "outside": float(length_total - within),
+            "share": float(within / length_total) if length_total else 0.0,
+        }
+    return buffer_curve
+
+
+def evaluate_polygon_layer_raster(
+    poly, edges, polygon_buffer=100, resolution=10, network_index=None, tile_size=64
+):
+    """
+    estimate where study_area linestrings run through a given polygon layer
+    (buffered by polygon_buffer) on a raster instead of with vector overlays:
+    the edges are split into pieces of resolution / 2 m, and the grid of
+    resolution x resolution m is only built in tiles of tile_size x tile_size cells
+    that contain network pieces. in each tile, the polygons (clipped to the tile
+    plus a margin of polygon_buffer) are rasterized (see rasterize_polygons) with
+    one class per polygon type, and buffered on the grid (cells within polygon_buffer
+    of a polygon cell); each piece is assigned the classes of the cell at its midpoint.
+    runtime and memory depend on the network length, not on the extent of the
+    network or on polygon complexity.
+    both input gdfs must be in the same projected CRS; at most 32 polygon types.
+    returns
+        gdf of edge segments within the polygon layer ("types": types of the cells
+            the segment runs through, "types_count": number of types)
+        surface (sqm) of evaluation area (within the tiles around the network)
+        dict with length of network (in m) per type and type combination (see compute_type_lengths)
+        dict with the estimation error of the network length within the layer:
+            "crossings" (number of layer boundary crossings on the grid),
+            "expected" (heuristic standard error in m, assuming edges cross the
+            layer boundary at right angles), and "uncertain" (length in m of the
+            network pieces close to a layer boundary on the grid, i.e. whose
+            classification may be wrong; the error is at most this length, unless
+            the layer contains polygons narrower than a grid cell)
+    """
+
+    assert poly.crs == edges.crs, "CRS of input layers do not match!"
+
+    # explode edges
+    if network_index is None:
+        edges = edges.explode(index_parts=False)
+    else:
+        edges = network_index["edges"]
+    edge_geoms = edges.geometry.values
+
+    # one class per type
+    type_names = np.array(sorted(poly["type"].unique()), dtype=object)
+    assert len(type_names) <= 32, "Raster engine supports at most 32 polygon types"
+    poly_classes = np.searchsorted(type_names, poly["type"].values)
+    poly_geoms = poly.geometry.values
+    poly_tree = strtree.STRtree(geoms=poly_geoms)
+
+    # split edges into pieces of at most resolution / 2
+    step = resolution / 2
+    piece_edge, piece_start, piece_length = split_line_positions(
+        shapely.length(edge_geoms), step
+    )
+    piece_end = piece_start + piece_length
+
+    # grid cell of the midpoint of each piece (grid origin outside of the network)
+    midpoints = shapely.get_coordinates(
+        shapely.line_interpolate_point(
+            edge_geoms[piece_edge], piece_start + piece_length / 2
+        )
+    )
+    minx, miny, _, _ = shapely.total_bounds(edge_geoms)
+    x0 = minx - resolution
+    y0 = miny - resolution
+    cols = ((midpoints[:, 0] - x0) // resolution).astype(np.int64)
+    rows = ((midpoints[:, 1] - y0) // resolution).astype(np.int64)
+
+    # a piece may be misclassified if a layer boundary on the grid is within the
+    # rasterization error (half a cell diagonal, for the polygons and for the buffer),
+    # plus the distance from the piece midpoint to its cell center, plus half a piece
+    tolerance = 1.5 * resolution * np.sqrt(2) + step / 2
+
+    # tiles with network pieces, with a margin for buffering and boundary distances
+    margin = int(np.ceil((polygon_buffer + tolerance) / resolution)) + 1
+    tile_keys, piece_tile = np.unique(
+        np.column_stack([rows // tile_size, cols // tile_size]), axis=0, return_inverse=True
+    )
+    # group the pieces by tile once: the pieces of tile k are tile_pieces[tile_starts[k]:tile_starts[k + 1]]
+    piece_tile = piece_tile.ravel()
+    tile_pieces = np.argsort(piece_tile, kind="stable")
+    tile_starts = np.searchsorted(piece_tile[tile_pieces], np.arange(len(tile_keys) + 1))
+    cells = tile_size + 2 * margin
+
+    piece_classes = np.zeros(len(piece_edge), dtype=np.uint32)
+    piece_boundary_dist = np.full(len(piece_edge), np.inf)
+    area = 0.0
+    for k, (tile_row, tile_col) in enumerate(tile_keys):
+        row0 = tile_row * tile_size - margin
+        col0 = tile_col * tile_size - margin
+        bounds = (
+            x0 + col0 * resolution,
+            y0 + row0 * resolution,
+            x0 + (col0 + cells) * resolution,
+            y0 + (row0 + cells) * resolution,
+        )
+        q = poly_tree.query(shapely.box(*bounds), predicate="intersects")
+        raster = np.zeros((cells, cells), dtype=np.uint32)
+        if len(q) > 0:
+            raster = rasterize_polygons(
+                shapely.clip_by_rect(poly_geoms[q], *bounds),
+                poly_classes[q],
+                bounds,
+                resolution,
+            )
+
+        # buffer on the grid: cells within polygon_buffer of a class cell
+        # (center to center distance, plus half a cell to the polygon boundary)
+        if polygon_buffer > 0:
+            raster_buffered = np.zeros_like(raster)
+            for c in np.unique(poly_classes[q]):
+                in_class = (raster >> np.uint32(c)) & np.uint32(1) == 1
+                if in_class.any():
+                    within = (
+                        ndimage.distance_transform_edt(~in_class, sampling=resolution)
+                        <= polygon_buffer + resolution / 2
+                    )
+                    raster_buffered |= within.astype(np.uint32) << np.uint32(c)
+            raster = raster_buffered
+
+        area += float(
+            (raster > 0)[margin : margin + tile_size, margin : margin + tile_size].sum()
+            * resolution**2
+        )
 
+        # distance (center to center) of each cell to the nearest cell on the other
+        # side of a layer boundary (of any type, as pieces count for each of their types)
+        boundary_dist = np.full(raster.shape, np.inf)
+        for c in np.unique(poly_classes[q]):
+            in_class = (raster >> np.uint32(c)) & np.uint32(1) == 1
+            if in_class.any() and not in_class.all():
+                boundary_dist = np.minimum(
+                    boundary_dist,
+                    np.where(
+                        in_class,
+                        ndimage.distance_transform_edt(in_class, sampling=resolution),
+                        ndimage.distance_transform_edt(~in_class, sampling=resolution),
+                    ),
+                )
+
+        in_tile = tile_pieces[tile_starts[k] : tile_starts[k + 1]]
+        tile_rows = rows[in_tile] - row0
+        tile_cols = cols[in_tile] - col0
+        piece_classes[in_tile] = raster[tile_rows, tile_cols]
+        piece_boundary_dist[in_tile] = boundary_dist[tile_rows, tile_cols]
+
+    # types per class combination, e.g. "forest_wetland_" (as in evaluate_polygon_layer)
+    combinations = np.unique(piece_classes)
+    combination_types = {
+        int(k): "".join(
+            t + "_" for c, t in enumerate(type_names) if (int(k) >> c) & 1
+        )
+        for k in combinations
+    }
+
+    # merge consecutive pieces of the same edge with the same classes into segments
+    inside = piece_classes > 0
+    new_run = np.ones(len(piece_edge), dtype=bool)
+    new_run[1:] = (piece_edge[1:] != piece_edge[:-1]) | (
+        piece_classes[1:] != piece_classes[:-1]
+    )
+    run_id = np.cumsum(new_run) - 1
+    last_of_run = np.append(new_run[1:], True)
 
-def evaluate_point_layer(points, edges, points_buffer):
+    # vertices of each segment: start of each of its pieces, plus end of its last piece
+    vertex_piece = np.concatenate(
+        [np.flatnonzero(inside), np.flatnonzero(inside & last_of_run)]
+    )
+    vertex_pos = np.concatenate(
+        [piece_start[inside], piece_end[inside & last_of_run]]
+    )
+    order = np.lexsort((vertex_pos, run_id[vertex_piece]))
+    vertex_piece = vertex_piece[order]
+    vertex_pos = vertex_pos[order]
+    vertices = shapely.get_coordinates(
+        shapely.line_interpolate_point(edge_geoms[piece_edge[vertex_piece]], vertex_pos)
+    )
+    segment_ids, segment_idx = np.unique(run_id[vertex_piece], return_inverse=True)
+    segments = shapely.linestrings(vertices, indices=segment_idx)
+    first_piece = np.flatnonzero(new_run)[segment_ids]
+    segment_types = [combination_types[int(k)] for k in piece_classes[first_piece]]
+
+    gdf_inter = gpd.GeoDataFrame(
+        {"types": segment_types}, geometry=segments, crs=edges.crs
+    )
+    gdf_inter["types_count"] = gdf_inter["types"].str.count("_")
+
+    # length per type (each piece counts for all classes of its cell)
+    class_bits = (piece_classes[:, None] >> np.arange(len(type_names), dtype=np.uint32)) & 1
+    type_lengths = {
+        "type": {
+            str(t): float(piece_length[class_bits[:, c] == 1].sum())
+            for c, t in enumerate(type_names)
+        },
+        "type_combination": {
+            str(t): float(l)
+            for t, l in gdf_inter.length.groupby(gdf_inter["types"]).sum().items()
+        },
+    }
+
+    # estimation error: the expected error is a heuristic (at each crossing of the layer
+    # boundary, the boundary is off by up to half a cell diagonal plus half a piece);
+    # the uncertain length is measured from the distance of each piece to a layer boundary
+    crossings = int(((inside[1:] != inside[:-1]) & (piece_edge[1:] == piece_edge[:-1])).sum())
+    raster_error = {
+        "resolution": resolution,
+        "crossings": crossings,
+        "expected": float(np.sqrt(crossings * (resolution**2 + step**2) / 12)),
+        "uncertain": float(piece_length[piece_boundary_dist <= tolerance].sum()),
+    }
+
+    return gdf_inter, area, type_lengths, raster_error
+
+
+def evaluate_point_layer(points, edges, points_buffer, edges_buff_area=None):
     """
     find out where buffered study_area linestrings intersect with a given
     point layer. both input gdfs must be in the same projected CRS.
     keep track of which, and how many, types (from poly layer)
     each of the edge segments intersects with (to track variation).
+    the union of the buffered edges can be passed as edges_buff_area
+    (see EvaluationSession.edge_buffer_union) to avoid recomputing it.
     """
 
     assert points.crs == edges.crs, "CRS of input layers do not match!"
@@ -319,13 +1189,14 @@ def evaluate_point_layer(points, edges, points_buffer):
     # explode points
     points = points.explode(index_parts=False)
 
-    # explode edges
-    edges = edges.explode(index_parts=False)
+    if edges_buff_area is None:
+        # explode edges
+        edges = edges.explode(index_parts=False)
 
-    # buffer edges
-    edges_buff = edges.copy()
-    edges_buff["geometry"] = edges_buff.buffer(points_buffer)
-    edges_buff_area = edges_buff.unary_union
+        # buffer edges
+        edges_buff = edges.copy()
+        edges_buff["geometry"] = edges_buff.buffer(points_buffer)
+        edges_buff_area = edges_buff.unary_union
 
     # return gdf of points with info whether they are within reach or not
     points["withinreach"] = 0
@@ -335,12 +1206,459 @@ def evaluate_point_layer(points, edges, points_buffer):
     # the ones that intersect with the buffered edge area, are within reach
     points.loc[q, "withinreach"] = 1
 
-    # not included, but maybe later? also return edges with info WHICH point is within reach
-    # (again, accounting for variation)
+    # for info on WHICH edges are within reach of each point,
+    # see compute_point_edge_incidence
 
     return points
 
 
+def build_network_index(edges):
+    """
+    explode the network edges and build a spatial index of the edge parts,
+    to be reused for all points evaluated against the same network
+    (e.g. all chunks of a large point layer).
+    returns dict with
+        "crs": CRS of the network edges
+        "edge_count": number of (non-exploded) network edges
+        "edges": exploded edges, indexed by the position of each edge in the edge layer
+        "tree": STRtree of the exploded edge geometries
+    """
+
+    # explode edges
+    edges_exploded = edges.reset_index(drop=True).explode(index_parts=False)
+
+    network_index = {}
+    network_index["crs"] = edges.crs
+    network_index["edge_count"] = len(edges)
+    network_index["edges"] = edges_exploded
+    # make strtree of edge geoms
+    network_index["tree"] = strtree.STRtree(geoms=edges_exploded.geometry.values)
+
+    return network_index
+
+
+def add_node_distances(network_index, nodes=None):
+    """
+    add the network graph and the network distance from each graph node to
+    its closest knudepunkt to a network index (see build_network_index).
+    graph nodes are the edge endpoints (as in momepy.gdf_to_nx); knudepunkter
+    are snapped to their closest graph node. shortest distances from all
+    knudepunkter are computed with one multi-source dijkstra run on a sparse
+    adjacency matrix. if no nodes are given, all graph nodes are knudepunkter.
+    adds to network_index:
+        "lengths": length of each exploded edge
+        "u", "v": graph node of the start and end of each exploded edge
+        "dist_nodes": network distance from each graph node to its closest knudepunkt
+    """
+
+    edge_geoms = network_index["edges"].geometry.values
+    edge_count = len(edge_geoms)
+    edge_lengths = shapely.length(edge_geoms)
+
+    # graph nodes are the edge endpoints
+    endpoints = np.vstack(
+        [
+            shapely.get_coordinates(shapely.get_point(edge_geoms, 0)),
+            shapely.get_coordinates(shapely.get_point(edge_geoms, -1)),
+        ]
+    )
+    node_coords, node_idx = np.unique(endpoints, axis=0, return_inverse=True)
+    node_idx = node_idx.ravel()
+    u = node_idx[:edge_count]
+    v = node_idx[edge_count:]
+
+    # sparse adjacency with edge lengths as weights (shortest of parallel edges,
+    # no self-loops; zero lengths are raised slightly so they still count as edges)
+    adj = pd.DataFrame(
+        {
+            "u": np.minimum(u, v),
+            "v": np.maximum(u, v),
+            "length": np.maximum(edge_lengths, 1e-9),
+        }
+    )
+    adj = adj[adj.u != adj.v].groupby(["u", "v"], as_index=False)["length"].min()
+    adj = sparse.csr_matrix(
+        (adj["length"].values, (adj["u"].values, adj["v"].values)),
+        shape=(len(node_coords), len(node_coords)),
+    )
+
+    # origins: graph nodes closest to the knudepunkter
+    if nodes is None:
+        sources = np.arange(len(node_coords))
+    else:
+        assert nodes.crs == network_index["crs"], "CRS of input layers do not match!"
+        nodetree = strtree.STRtree(geoms=shapely.points(node_coords))
+        sources = np.unique(
+            nodetree.query_nearest(nodes.explode(index_parts=False).geometry.values)[1]
+        )
+
+    network_index["lengths"] = edge_lengths
+    network_index["u"] = u
+    network_index["v"] = v
+    network_index["dist_nodes"] = csgraph.dijkstra(
+        adj, directed=False, indices=sources, min_only=True
+    )
+
+    return network_index
+
+
+def summarize_network(network_edges):
+    """
+    dissolve the network edges (so that overlapping edges are only counted once)
+    and measure the network length.
+    returns dict with
+        "geometry": dissolved network
+        "length": length of the dissolved network (in meters)
+        "overlap_free": True if no edges overlap, i.e. if the summed up edge lengths
+            equal the dissolved length (then, lengths of edge parts can be summed up
+            without dissolving them first, see network_length)
+    """
+    geometry = network_edges.unary_union
+    length = geometry.length
+
+    summary = {}
+    summary["geometry"] = geometry
+    summary["length"] = length
+    summary["overlap_free"] = bool(
+        np.isclose(network_edges.length.sum(), length, rtol=1e-6)
+    )
+    return summary
+
+
+def network_length(network_parts, network_summary):
+    """
+    length of a subset of the network (e.g. the edge segments returned by
+    evaluate_polygon_layer), with overlapping parts counted only once.
+    if the network is overlap free (see summarize_network), the lengths of the parts
+    are summed up; otherwise, the parts are dissolved first.
+    """
+    if network_summary["overlap_free"]:
+        return float(network_parts.length.sum())
+    return network_parts.unary_union.length
+
+
+class EvaluationSession:
+    """
+    Network edges prepared once for the evaluation of all point and polygon layers
+    of a script02 run: the edges are exploded and indexed only once (see build_network_index),
+    network distances to the knudepunkter are computed at most once (see add_node_distances),
+    the dissolved edge buffers are computed at most once per buffer distance,
+    and the dissolved network and its length at most once (see summarize_network).
+
+    Arguments:
+        network_edges (gdf): network edges
+        network_nodes (gdf): network nodes (knudepunkter), used for network distances;
+            if None, all edge endpoints are used
+    """
+
+    def __init__(self, network_edges, network_nodes=None):
+        self.network_edges = network_edges
+        self.network_nodes = network_nodes
+        self.network_index = build_network_index(network_edges)
+        self.buffer_unions = {}  # buffer distance -> dissolved edge buffers
+        self.summary = None  # dissolved network and its length
+
+    def edge_buffer_union(self, dist):
+        """
+        Return the union of all network edges buffered by dist (computed once per distance)
+        """
+        if dist not in self.buffer_unions:
+            self.buffer_unions[dist] = (
+                self.network_index["edges"].buffer(dist).unary_union
+            )
+        return self.buffer_unions[dist]
+
+    def network_summary(self):
+        """
+        Return the dissolved network and its length (computed once, see summarize_network)
+        """
+        if self.summary is None:
+            self.summary = summarize_network(self.network_edges)
+        return self.summary
+
+    def node_distances(self):
+        """
+        Return the network index with network distances to the knudepunkter (computed once)
+        """
+        if "dist_nodes" not in self.network_index:
+            add_node_distances(self.network_index, self.network_nodes)
+        return self.network_index
+
+
+def evaluate_point_layer_distance(points, edges, points_buffer, network_index=None):
+    """
+    find out which points of a given point layer are within reach of the
+    study_area linestrings, based on each point's euclidean distance to
+    the nearest network edge. uses a bulk nearest query on a spatial index
+    of the edges instead of buffering and dissolving the network.
+    both input gdfs must be in the same projected CRS.
+    a prebuilt network_index (see build_network_index) can be passed to
+    avoid rebuilding the spatial index.
+    returns gdf of points with columns "withinreach" (0/1) and
+    "dist_to_network" (in meters)
+    """
+
+    if network_index is None:
+        network_index = build_network_index(edges)
+
+    assert points.crs == network_index["crs"], "CRS of input layers do not match!"
+
+    # explode points
+    points = points.explode(index_parts=False)
+
+    # nearest edge (and distance to it) for all points in one query;
+    # points with empty geometries are not returned by the query
+    q, q_dist = network_index["tree"].query_nearest(
+        points.geometry.values, return_distance=True, all_matches=False
+    )
+    dist_to_network = np.full(len(points), np.nan)
+    dist_to_network[q[0]] = q_dist
+
+    # points within the buffer distance of any edge are within reach
+    points["withinreach"] = (dist_to_network <= points_buffer).astype(int)
+    points["dist_to_network"] = dist_to_network
+
+    return points
+
+
+def evaluate_point_layer_network(
+    points, edges, points_buffer, nodes=None, network_index=None
+):
+    """
+    find out which points of a given point layer are within reach of the
+    network nodes (knudepunkter), measured along the network: each point is
+    snapped to its nearest edge, and its distance is the straight-line distance
+    to the snapping location plus the shortest distance along the network from
+    there to the nearest node (see add_node_distances).
+    if no nodes are given, all edge endpoints are used as nodes.
+    all input gdfs must be in the same projected CRS.
+    a prebuilt network_index (see build_network_index) can be passed to
+    avoid rebuilding the spatial index and the network distances.
+    returns gdf of points with columns "withinreach" (0/1),
+    "dist_to_network" and "dist_via_network" (in meters)
+    """
+
+    if network_index is None:
+        network_index = build_network_index(edges)
+    if "dist_nodes" not in network_index:
+        add_node_distances(network_index, nodes)
+
+    assert points.crs == network_index["crs"], "CRS of input layers do not match!"
+
+    # explode points
+    points = points.explode(index_parts=False)
+
+    # snap points to nearest edge
+    q, q_dist = network_index["tree"].query_nearest(
+        points.geometry.values, return_distance=True, all_matches=False
+    )
+    point_idx, edge_idx = q
+    along = shapely.line_locate_point(
+        network_index["edges"].geometry.values[edge_idx],
+        points.geometry.values[point_idx],
+    )
+
+    # from the snapping location, continue along the edge to whichever end is closer
+    # to a knudepunkt
+    u = network_index["u"][edge_idx]
+    v = network_index["v"][edge_idx]
+    dist_nodes = network_index["dist_nodes"]
+    dist_via = q_dist + np.minimum(
+        along + dist_nodes[u],
+        network_index["lengths"][edge_idx] - along + dist_nodes[v],
+    )
+
+    dist_to_network = np.full(len(points), np.nan)
+    dist_to_network[point_idx] = q_dist
+    # points on edges without any path to a knudepunkt have no network distance
+    dist_via[np.isinf(dist_via)] = np.nan
+    dist_via_network = np.full(len(points), np.nan)
+    dist_via_network[point_idx] = dist_via
+
+    points["withinreach"] = (dist_via_network <= points_buffer).astype(int)
+    points["dist_to_network"] = dist_to_network
+    points["dist_via_network"] = dist_via_network
+
+    return points
+
+
+def compute_point_edge_incidence(points, edges, points_buffer, network_index=None):
+    """
+    find out which network edges are within reach (within points_buffer)
+    of each point of a given point layer, with one bulk "dwithin" query
+    on a spatial index of the edges. both input gdfs must be in the same projected CRS.
+    points are referenced by their position in the (exploded) point layer,
+    edges by their position in the edge layer.
+    a prebuilt network_index (see build_network_index) can be passed to
+    avoid rebuilding the spatial index.
+    returns
+        sparse matrix (scipy csr, points x edges) with 1 for each edge within reach of a point
+        DataFrame in long format (columns "point_index", "edge_index", "edge_id", "distance"),
+        one row per point-edge pair
+    """
+
+    if network_index is None:
+        network_index = build_network_index(edges)
+
+    assert points.crs == network_index["crs"], "CRS of input layers do not match!"
+
+    # explode points
+    points = points.explode(index_parts=False).reset_index(drop=True)
+
+    edges_exploded = network_index["edges"]
+
+    # all (point, edge part) pairs within reach, in one query
+    point_idx, part_idx = network_index["tree"].query(
+        points.geometry.values, predicate="dwithin", distance=points_buffer
+    )
+    pairs = pd.DataFrame(
+        {
+            "point_index": point_idx,
+            "edge_index": edges_exploded.index.values[part_idx],
+            "distance": shapely.distance(
+                points.geometry.values[point_idx],
+                edges_exploded.geometry.values[part_idx],
+            ),
+        }
+    )
+    if "edge_id" in edges_exploded.columns:
+        pairs.insert(2, "edge_id", edges_exploded["edge_id"].values[part_idx])
+
+    # multipart edges can be found several times per point: keep the closest part
+    pairs = (
+        pairs.sort_values("distance")
+        .drop_duplicates(["point_index", "edge_index"])
+        .sort_values(["point_index", "edge_index"])
+        .reset_index(drop=True)
+    )
+
+    incidence = sparse.csr_matrix(
+        (
+            np.ones(len(pairs), dtype=np.int8),
+            (pairs["point_index"].values, pairs["edge_index"].values),
+        ),
+        shape=(len(points), network_index["edge_count"]),
+    )
+
+    return incidence, pairs
+
+
+def compute_reach_curve(dist_to_network, thresholds):
+    """
+    Compute the cumulative reach curve of a point layer: for each distance threshold,
+    the number and share of points within reach of the network
+
+    Arguments:
+        dist_to_network (array): distance of each point to the network (NaN if unknown)
+        thresholds (list of numeric): distance thresholds (in meters)
+
+    Returns:
+        reach_curve (dict): threshold -> {"within": int, "outside": int, "share": float},
+        sorted by threshold
+    """
+    dist_sorted = np.sort(dist_to_network[~np.isnan(dist_to_network)])
+    total = len(dist_to_network)
+    thresholds = sorted(set(thresholds))
+    # number of points at or below each threshold, all thresholds in one call
+    within = np.searchsorted(dist_sorted, thresholds, side="right")
+
+    reach_curve = {}
+    for t, w in zip(thresholds, within):
+        reach_curve[t] = {
+            "within": int(w),
+            "outside": int(total - w),
+            "share": float(w / total) if total else 0.0,
+        }
+    return reach_curve
+
+
+### PARALLEL EVALUATION
+
+# network prepared for evaluation in a worker process (see init_evaluation_worker)
+_worker_session = None
+
+
+def init_evaluation_worker(network_edges, network_nodes=None):
+    """
+    Prepare the network once per worker process of run_evaluation_tasks
+    (network edges and nodes are handed over by the main process, not read from file)
+    """
+    global _worker_session
+    _worker_session = EvaluationSession(network_edges, network_nodes)
+
+
+def evaluate_layer_task(task, session=None):
+    """
+    Evaluate and export one point or polygon layer, without display
+
+    Arguments:
+        task (dict): with key "geomtype" ("point" or "polygon") and key "kwargs" (keyword arguments
+            for evaluate_export_plot_point or evaluate_export_plot_poly, except network_edges and session)
+        session (EvaluationSession): network prepared for evaluation; if None, the network of the
+            current worker process is used (see init_evaluation_worker)
+    Returns:
+        res (dict): summary statistics of evaluation results
+    """
+    if session is None:
+        session = _worker_session
+
+    if task["geomtype"] == "point":
+        _, _, res = evaluate_export_plot_point(
+            network_edges=session.network_edges,
+            display_output=False,
+            session=session,
+            **task["kwargs"],
+        )
+    elif task["geomtype"] == "polygon":
+        _, _, res = evaluate_export_plot_poly(
+            network_edges=session.network_edges,
+            display_output=False,
+            display_input=False,
+            session=session,
+            **task["kwargs"],
+        )
+    else:
+        raise ValueError(f"Unknown geometry type: {task['geomtype']}")
+
+    return res
+
+
+def run_evaluation_tasks(tasks, network_edges, network_nodes=None, workers=1):
+    """
+    Evaluate and export point and polygon layers (without display), either one
+    after another or spread across a pool of worker processes
+
+    Arguments:
+        tasks (list of dict): one task per layer (see evaluate_layer_task)
+        network_edges (gdf): network edges
+        network_nodes (gdf): network nodes (knudepunkter), see EvaluationSession
+        workers (int): number of worker processes; if 1, all layers are evaluated in the main process
+    Returns:
+        list of res (dict): summary statistics of evaluation results, in the order of tasks
+    """
+    if workers <= 1 or len(tasks) <= 1:
+        # prepare the network once (in the main process) for all layers
+        session = EvaluationSession(network_edges, network_nodes)
+        return [evaluate_layer_task(task, session) for task in tasks]
+
+    # worker functions must be importable by the worker processes (see import_worker_module)
+    from src.mp_func import get_mp_context, import_worker_module
+
+    worker_module = import_worker_module("eval_func")
+
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(tasks)),
+        mp_context=get_mp_context(),
+        initializer=worker_module.init_evaluation_worker,
+        initargs=(network_edges, network_nodes),
+    ) as executor:
+        futures = [
+            executor.submit(worker_module.evaluate_layer_task, task) for task in tasks
+        ]
+        # collect in order of submission (deterministic, regardless of which layer finishes first)
+        return [future.result() for future in futures]
+
+
 ### TOPOLOGICAL EVALUATION
 
 
@@ -0,0 +1,38 @@
+import os
+import sys
+import importlib
+import multiprocessing
+
+
+def get_mp_context():
+    """
+    Get multiprocessing context for worker processes: fork on Linux; otherwise spawn
+    (fork is unsafe on macOS, and not available on Windows), with the python interpreter
+    of the QGIS installation (inside QGIS, sys.executable is the QGIS application itself)
+    """
+    if sys.platform.startswith("linux"):
+        return multiprocessing.get_context("fork")
+
+    context = multiprocessing.get_context("spawn")
+    if os.name == "nt":
+        python_exe = os.path.join(sys.exec_prefix, "python.exe")
+    else:
+        python_exe = os.path.join(sys.exec_prefix, "bin", "python3")
+    if os.path.exists(python_exe):
+        context.set_executable(python_exe)
+    return context
+
+
+def import_worker_module(module_name):
+    """
+    Import a module of the src folder (e.g. "eval_func"), so that the functions run by
+    worker processes can be found by them: the scripts exec the src modules, but worker
+    processes import functions by module path (the project folder is on sys.path, see scripts)
+
+    Arguments:
+        module_name (str): name of module in the src folder
+
+    Returns:
+        module: the imported module src.<module_name>
+    """
+    return importlib.import_module(f"src.{module_name}")
@@ -0,0 +1,180 @@
+import os
+import hashlib
+import pickle
+import shutil
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import networkx as nx
+import momepy
+from scipy import sparse
+from scipy.sparse import csgraph
+
+# increase when the content of the graph cache changes, so that old caches are rebuilt
+GRAPH_CACHE_VERSION = 1
+
+
+def hash_file(filepath, chunk_size=2**20):
+    """
+    Compute the content hash (sha256) of a file, reading it in chunks
+
+    Arguments:
+        filepath (str): path to file
+        chunk_size (int): number of bytes read at once
+
+    Returns:
+        file_hash (str): hex digest of the file content
+    """
+    file_hash = hashlib.sha256()
+    with open(filepath, "rb") as opened_file:
+        for chunk in iter(lambda: opened_file.read(chunk_size), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def build_network_graph(edges_in):
+    """
+    Convert network edges into a networkx graph with momepy, remove degree 0 nodes,
+    and get node and edge tables of the graph
+
+    Arguments:
+        edges_in (gdf): network edges
+
+    Returns:
+        G (nx.Graph): undirected network graph
+        nodes (gdf): graph nodes (with "nodeID" and "degree")
+        edges (gdf): graph edges (with "node_start" and "node_end")
+        degree_histograms (dict): degree histogram before ("input") and after ("graph") removing degree 0 nodes
+    """
+    # convert to networkx object with momepy
+    G = momepy.gdf_to_nx(
+        gdf_network=edges_in,
+        multigraph=False,
+        #    integer_labels=True, # only in momepy 0.8+
+        directed=False,
+    )
+
+    # remove degree 0 nodes
+    degree_histograms = {"input": nx.degree_histogram(G)}
+    nodes_to_remove = [node for node in G.nodes if nx.degree(G, node) == 0]
+    G.remove_nodes_from(nodes_to_remove)
+    degree_histograms["graph"] = nx.degree_histogram(G)
+
+    # using momepy to get nodes and edges gdf with corresponding labels and geometry objects
+    nodes, edges = momepy.nx_to_gdf(net=G, points=True, lines=True)
+
+    # add degree labels to nodes (G is keyed by node coordinates, nodes by nodeID,
+    # so degrees are taken from the adjacency matrix instead of merging on the index)
+    nodes["degree"] = np.asarray(build_adjacency(nodes, edges).sum(axis=1)).ravel()
+
+    return G, nodes, edges, degree_histograms
+
+
+def build_adjacency(nodes, edges):
+    """
+    Build a compact adjacency matrix of the graph from the edge endpoints
+
+    Arguments:
+        nodes (gdf): graph nodes with "nodeID"
+        edges (gdf): graph edges with "node_start" and "node_end" (nodeIDs)
+
+    Returns:
+        adjacency (sparse.csr_matrix): symmetric node x node matrix (in the order of nodes),
+        with the number of edges between each pair of nodes
+    """
+    node_position = pd.Series(np.arange(len(nodes)), index=nodes["nodeID"].values)
+    u = node_position.loc[edges["node_start"].values].values
+    v = node_position.loc[edges["node_end"].values].values
+    adjacency = sparse.coo_matrix(
+        (np.ones(2 * len(edges), dtype=np.int32), (np.r_[u, v], np.r_[v, u])),
+        shape=(len(nodes), len(nodes)),
+    ).tocsr()
+    return adjacency
+
+
+def label_components(nodes, edges, adjacency):
+    """
+    Label the connected components of the graph, numbered by size
+    (number of nodes; largest connected component first, starting to count at 1)
+
+    Arguments:
+        nodes (gdf): graph nodes with "nodeID"
+        edges (gdf): graph edges with "node_start" and "node_end" (nodeIDs)
+        adjacency (sparse.csr_matrix): adjacency matrix of the graph (see build_adjacency)
+
+    Returns:
+        node_components (np.array): component number of each node (in the order of nodes)
+        edge_components (np.array): component number of each edge (in the order of edges)
+    """
+    n_components, labels = csgraph.connected_components(
+        adjacency, directed=False
+    )
+    # stable sort keeps the order in which components were found for equal sizes
+    sizes = np.bincount(labels, minlength=n_components)
+    order = np.argsort(-sizes, kind="stable")
+    rank = np.empty(n_components, dtype=np.int64)
+    rank[order] = np.arange(1, n_components + 1)
+    node_components = rank[labels]
+    node_position = pd.Series(np.arange(len(nodes)), index=nodes["nodeID"].values)
+    edge_components = node_components[
+        node_position.loc[edges["node_start"].values].values
+    ]
+    return node_components, edge_components
+
+
+def load_network_graph(edges_fp, cache_dir):
+    """
+    Load the network graph of an edges file from cache; the graph is only built
+    (see build_network_graph) if the content of the edges file has changed since the cache was saved
+
+    Arguments:
+        edges_fp (str): path to network edges file (e.g. edges.gpkg)
+        cache_dir (str): folder of the graph cache
+
+    Returns:
+        graph (dict): "edges_hash" (content hash of the edges file), "nodes", "edges",
+        "degree_histograms" (see build_network_graph), "adjacency" (see build_adjacency),
+        and "graph_fp" (path to the pickled networkx graph)
+    """
+    cache_fp = os.path.join(cache_dir, "graph_cache.pickle")
+    graph_fp = os.path.join(cache_dir, "graph_cache_nx.pickle")
+    edges_hash = hash_file(edges_fp)
+
+    if os.path.exists(cache_fp) and os.path.exists(graph_fp):
+        with open(cache_fp, "rb") as f:
+            graph = pickle.load(f)
+        if (
+            graph.get("version") == GRAPH_CACHE_VERSION
+            and graph.get("edges_hash") == edges_hash
+        ):
+            print("Network graph loaded from cache.")
+            graph["graph_fp"] = graph_fp
+            return graph
+
+    print("Building network graph (input edges have changed or no cache found)...")
+    G, nodes, edges, degree_histograms = build_network_graph(gpd.read_file(edges_fp))
+    graph = {
+        "version": GRAPH_CACHE_VERSION,
+        "edges_hash": edges_hash,
+        "nodes": nodes,
+        "edges": edges,
+        "degree_histograms": degree_histograms,
+        "adjacency": build_adjacency(nodes, edges),
+    }
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(graph_fp, "wb") as f:
+        pickle.dump(G, f, pickle.HIGHEST_PROTOCOL)
+    with open(cache_fp, "wb") as f:
+        pickle.dump(graph, f, pickle.HIGHEST_PROTOCOL)
+
+    graph["graph_fp"] = graph_fp
+    return graph
+
+
+def export_network_graph(graph, filepath):
+    """
+    Save the networkx graph of a loaded network graph (see load_network_graph) as pickle,
+    by copying the cached file (without loading it)
+    """
+    shutil.copyfile(graph["graph_fp"], filepath)
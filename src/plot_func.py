@@ -402,6 +402,46 @@ def draw_categorical_layer(
     iface.layerTreeView().refreshLayerSymbology(layer.id())
 
 
+def draw_components_layer(
+    layer_name,
+    comp_colors,
+    attr_name="component",
+    other_color="160,160,160",
+    line_width=1,
+):
+    """
+    Plot line layer of disconnected components with one category per component;
+    components not in comp_colors are drawn in one shared "other components" category
+
+    Arguments:
+        layer_name (str): name of layer to plot
+        comp_colors (dict): component number (int) -> color (string of three RGB values between 0 and 255)
+        attr_name (str): name of attribute with component numbers
+        other_color (str): color of all other components (string of three RGB values between 0 and 255)
+        line_width (numerical): width of line features
+
+    Returns:
+        None
+    """
+
+    layer = QgsProject.instance().mapLayersByName(layer_name)[0]
+
+    categories = []
+    for comp, color in comp_colors.items():
+        symbol = QgsLineSymbol.createSimple({"color": color, "width": line_width})
+        categories.append(QgsRendererCategory(comp, symbol, f"Component {comp}"))
+
+    # a category with an empty value is used by QGIS for all other values
+    symbol = QgsLineSymbol.createSimple({"color": other_color, "width": line_width})
+    categories.append(QgsRendererCategory("", symbol, "Other components"))
+
+    renderer = QgsCategorizedSymbolRenderer(attr_name, categories)
+    layer.setRenderer(renderer)
+
+    layer.triggerRepaint()
+    iface.layerTreeView().refreshLayerSymbology(layer.id())
+
+
 def draw_simple_polygon_layer(
     layer_name, color="0,0,0,128", outline_color="black", outline_width=1
 ):
@@ -886,29 +926,65 @@ def plot_slopes(homepath):
     return None
 
 
+def plot_slope_histogram(homepath, slope_stats):
+
+    # precomputed histogram (per-segment arrays are not needed)
+    histogram = slope_stats["segs_slope_histogram"]
+    bins = histogram["bins"]
+    length_km = np.array(histogram["length"]) / 1000
+
+    config_slope = yaml.load(
+        open(homepath + "/config/config-slope.yml"), Loader=yaml.FullLoader
+    )
+    slope_ranges = config_slope["slope_ranges"]
+    config_color = yaml.load(
+        open(homepath + "/config/config-colors-slope.yml"), Loader=yaml.FullLoader
+    )
+    slope_colors = [rgb2hex(c) for c in config_color["slope"]]
+
+    # color each bin by the slope range it falls into
+    bin_colors = [
+        slope_colors[min(np.searchsorted(slope_ranges, b, side="right") - 1, 3)]
+        for b in bins
+    ]
+    labels = [f"{bins[i]:g}-{bins[i+1]:g}" for i in range(len(bins) - 1)] + [
+        f">{bins[-1]:g}"
+    ]
+
+    fig, ax = plt.subplots(1, 1, figsize=(10, 5))
+    ax.bar(range(len(bins)), length_km, color=bin_colors)
+    ax.set_xticks(range(len(bins)))
+    ax.set_xticklabels(labels, rotation=90)
+    ax.set_xlabel("Segment slope (%)")
+    ax.set_ylabel("Network length (km)")
+    ax.set_title("Slope distribution")
+
+    fig.savefig(
+        homepath + f"/results/plots/slopes_histogram.png", dpi=300, bbox_inches="tight"
+    )
+
+    plt.close()
+
+    return None
+
+
 def plot_components(homepath):
 
-    comppath = homepath + "/data/output/network/components/"
-    comp_files = sorted([f for f in os.listdir(comppath) if f[-5:] == ".gpkg"])
-    if len(comp_files) > 0:
-        comp_idx = [int(re.findall("\d+", f)[0]) for f in comp_files]
-        comp_dict = {}
-        for file, idx in zip(comp_files, comp_idx):
-            comp_dict[idx] = gpd.read_file(comppath + file)
-
-        layercolors = sns.color_palette("colorblind", len(comp_idx))
-        comp_colors = {}
-        for k, v in zip(comp_idx, layercolors):
-            comp_colors[k] = (
-                str([int(rgba * 255) for rgba in v]).replace("[", "").replace("]", "")
-            )
-        for k, v in comp_colors.items():
-            comp_colors[k] = rgb2hex(v)
+    # largest components in colors of the seaborn colorblind palette, all others in grey
+    # (as in the "Disconnected components" layer of script04)
+    comps = gpd.read_file(homepath + "/data/output/network/components.gpkg")
+    palette = sns.color_palette("colorblind")
 
     fig, ax = plt.subplots(1, 1, figsize=(10, 10))
 
-    for idx in comp_idx:
-        comp_dict[idx].plot(ax=ax, color=comp_colors[idx], label=f"Component {idx}")
+    others = comps[comps["component"] > len(palette)]
+    if len(others) > 0:
+        others.plot(ax=ax, color="#a0a0a0", label="Other components")
+
+    for idx, color in zip(range(1, len(palette) + 1), palette):
+        comp = comps[comps["component"] == idx]
+        if len(comp) > 0:
+            comp.plot(ax=ax, color=color, label=f"Component {idx}")
 
     ax.set_title("Disconnected components")
     ax.set_axis_off()
@@ -0,0 +1,882 @@
+import os
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+
+class DemWindows:
+    """
+    Digital elevation model that is opened lazily and read in windows: only the windows
+    containing sample points are read from the raster, each of them once per call of sample.
+    The most recently used windows are kept in memory (at most max_windows), and if cache_dir
+    is given, read windows are also saved as files in cache_dir (memory-mapped, and reused
+    by later runs on the same DEM), so that memory use depends neither on the size of the DEM
+    nor on the extent of the sampled points. Values keep the data type of the raster
+    (integer rasters with a nodata value are converted to float32, for NaN values).
+
+    Arguments:
+        dem_fp (str): filepath to DEM raster (e.g. dem.tif)
+        band (int): number of raster band with elevation values
+        window_size (int): width and height of windows (in raster cells)
+        cache_dir (str): folder for memory-mapped windows; if None, windows are only kept in memory
+        max_windows (int): maximum number of windows kept in memory
+    """
+
+    def __init__(
+        self, dem_fp, band=1, window_size=1024, cache_dir=None, max_windows=16
+    ):
+        # gdal comes with QGIS; only needed for reading the raster
+        from osgeo import gdal
+
+        self.dataset = gdal.Open(dem_fp)
+        self.band = self.dataset.GetRasterBand(band)
+        self.nodata = self.band.GetNoDataValue()
+        self.transform = self.dataset.GetGeoTransform()
+        self.shape = (self.dataset.RasterYSize, self.dataset.RasterXSize)
+        self.window_size = window_size
+        self.max_windows = max_windows
+        # (window row, window column) -> array of elevation values, least recently used first
+        self.windows = OrderedDict()
+
+        # one cache folder per DEM version and window size
+        self.cache_dir = None
+        if cache_dir is not None:
+            dem_stat = os.stat(dem_fp)
+            dem_key = hashlib.md5(
+                f"{os.path.abspath(dem_fp)}_{dem_stat.st_size}_{dem_stat.st_mtime_ns}_{band}_{window_size}".encode()
+            ).hexdigest()
+            self.cache_dir = os.path.join(cache_dir, dem_key)
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def window(self, window_row, window_col):
+        """
+        Return the elevation values of one window (NaN for nodata cells)
+        """
+        key = (window_row, window_col)
+        if key in self.windows:
+            self.windows.move_to_end(key)
+        else:
+            cache_fp = None
+            if self.cache_dir is not None:
+                cache_fp = os.path.join(self.cache_dir, f"{window_row}_{window_col}.npy")
+            if cache_fp is not None and os.path.exists(cache_fp):
+                values = np.load(cache_fp, mmap_mode="r")
+            else:
+                row_off = window_row * self.window_size
+                col_off = window_col * self.window_size
+                values = self.band.ReadAsArray(
+                    col_off,
+                    row_off,
+                    min(self.window_size, self.shape[1] - col_off),
+                    min(self.window_size, self.shape[0] - row_off),
+                )
+                if self.nodata is not None:
+                    is_nodata = values == self.nodata
+                    if not np.issubdtype(values.dtype, np.floating):
+                        values = values.astype(np.float32)
+                    values[is_nodata] = np.nan
+                if cache_fp is not None:
+                    # write to a temporary file first, so that other processes reading
+                    # the same window never load a partly written file
+                    tmp_fp = f"{cache_fp}.{os.getpid()}.tmp"
+                    with open(tmp_fp, "wb") as f:
+                        np.save(f, values)
+                    os.replace(tmp_fp, cache_fp)
+                    values = np.load(cache_fp, mmap_mode="r")
+            self.windows[key] = values
+            if len(self.windows) > self.max_windows:
+                self.windows.popitem(last=False)
+        return self.windows[key]
+
+    def sample(self, x, y):
+        """
+        Get DEM values at given point coordinates (value of the raster cell containing each point,
+        NaN for points outside the DEM or on nodata cells), reading only the windows containing points
+        """
+        x0, dx, rx, y0, ry, dy = self.transform
+        assert rx == 0 and ry == 0, "Rotated DEM rasters are not supported"
+
+        cols = np.floor((np.asarray(x) - x0) / dx).astype(np.int64)
+        rows = np.floor((np.asarray(y) - y0) / dy).astype(np.int64)
+        nrows, ncols = self.shape
+        inside = (rows >= 0) & (rows < nrows) & (cols >= 0) & (cols < ncols)
+        values = np.full(len(cols), np.nan)
+
+        # points grouped by window
+        point_idx = np.flatnonzero(inside)
+        window_rows = rows[point_idx] // self.window_size
+        window_cols = cols[point_idx] // self.window_size
+        window_ids, point_window = np.unique(
+            np.stack([window_rows, window_cols], axis=1), axis=0, return_inverse=True
+        )
+        order = np.argsort(point_window.ravel(), kind="stable")
+        starts = np.searchsorted(point_window.ravel()[order], np.arange(len(window_ids) + 1))
+
+        for w, (window_row, window_col) in enumerate(window_ids):
+            idx = point_idx[order[starts[w] : starts[w + 1]]]
+            values[idx] = self.window(window_row, window_col)[
+                rows[idx] - window_row * self.window_size,
+                cols[idx] - window_col * self.window_size,
+            ]
+
+        return values
+
+    def close(self):
+        """
+        Close the raster and release cached windows
+        """
+        self.windows = OrderedDict()
+        self.band = None
+        self.dataset = None
+
+
+def split_lines_by_length(edges, segment_length):
+    """
+    Split lines into segments of a maximum length (same as QGIS native:splitlinesbylength:
+    segments of exactly segment_length from the start of each line, plus a shorter last segment)
+
+    Arguments:
+        edges (gdf): network edges (LineStrings or MultiLineStrings, in a projected CRS)
+        segment_length (numeric): maximum segment length (in meters)
+
+    Returns:
+        segs (gdf): segments with the attributes of their edge and a unique "segment_id"
+    """
+    # single-part lines
+    parts, part_edge = shapely.get_parts(edges.geometry.values, return_index=True)
+    part_length = shapely.length(parts)
+    part_segments = np.maximum(1, np.ceil(part_length / segment_length)).astype(np.int64)
+
+    # vertices of each line, with their position along the line
+    coords, coord_part = shapely.get_coordinates(parts, return_index=True)
+    step = np.zeros(len(coords))
+    step[1:] = np.hypot(*(coords[1:] - coords[:-1]).T)
+    step[1:][coord_part[1:] != coord_part[:-1]] = 0
+    position = np.cumsum(step)
+    part_first = np.searchsorted(coord_part, np.arange(len(parts)))
+    position -= position[part_first][coord_part]
+
+    # vertices keep their segment; vertices right at a split point are replaced by the split point
+    coord_segment = np.minimum(
+        np.floor(position / segment_length).astype(np.int64),
+        part_segments[coord_part] - 1,
+    )
+    at_split = (position > 0) & (position == coord_segment * segment_length)
+    coords, coord_part, coord_segment, position = (
+        coords[~at_split],
+        coord_part[~at_split],
+        coord_segment[~at_split],
+        position[~at_split],
+    )
+
+    # split points, each one ending a segment and starting the next one
+    split_part = np.repeat(np.arange(len(parts)), part_segments - 1)
+    split_nr = 1 + np.arange(len(split_part)) - np.repeat(
+        np.cumsum(part_segments - 1) - (part_segments - 1), part_segments - 1
+    )
+    split_position = split_nr * segment_length
+    split_coords = shapely.get_coordinates(
+        shapely.line_interpolate_point(parts[split_part], split_position)
+    )
+
+    # all segment vertices, in order
+    vertex_coords = np.concatenate([coords, split_coords, split_coords])
+    vertex_part = np.concatenate([coord_part, split_part, split_part])
+    vertex_segment = np.concatenate([coord_segment, split_nr - 1, split_nr])
+    vertex_position = np.concatenate([position, split_position, split_position])
+    order = np.lexsort((vertex_position, vertex_segment, vertex_part))
+
+    # segment number (over all lines) of each vertex
+    segment_offset = np.cumsum(part_segments) - part_segments
+    vertex_segment_id = (segment_offset[vertex_part] + vertex_segment)[order]
+    geoms = shapely.linestrings(vertex_coords[order], indices=vertex_segment_id)
+
+    segment_edge = np.repeat(part_edge, part_segments)
+    segs = gpd.GeoDataFrame(
+        edges.drop(columns=edges.geometry.name).iloc[segment_edge].reset_index(drop=True),
+        geometry=geoms,
+        crs=edges.crs,
+    )
+    segs["segment_id"] = np.arange(1, len(segs) + 1)
+
+    return segs
+
+
+def sample_segment_elevations(segs, dem, elevation_col="elevation_1"):
+    """
+    Get elevation values at the start and end vertex of each segment
+
+    Arguments:
+        segs (gdf): segments with a unique "segment_id"
+        dem (DemWindows): DEM opened with DemWindows
+        elevation_col (str): name of column for elevation values
+
+    Returns:
+        ele (df): one row per segment vertex, with "segment_id", "vertex_index"
+        (0 for start, -1 for end vertex) and elevation values (NaN if outside of the DEM)
+    """
+    start = shapely.get_coordinates(shapely.get_point(segs.geometry.values, 0))
+    end = shapely.get_coordinates(shapely.get_point(segs.geometry.values, -1))
+    vertices = np.concatenate([start, end])
+
+    ele = pd.DataFrame(
+        {
+            "segment_id": np.concatenate([segs["segment_id"].values] * 2),
+            "vertex_index": np.repeat([0, -1], len(segs)),
+            elevation_col: dem.sample(vertices[:, 0], vertices[:, 1]),
+        }
+    )
+    ele = ele.sort_values(["segment_id", "vertex_index"], ascending=[True, False])
+
+    return ele.reset_index(drop=True)
+
+
+def pivot_segment_elevations(segs, ele, elevation_col="elevation_1"):
+    """
+    Get the elevation at the start and end vertex of each segment
+
+    Arguments:
+        segs (gdf): segments with a unique "segment_id"
+        ele (df): elevation values at segment vertices with "segment_id", "vertex_index"
+            (0 for start, -1 for end vertex) and elevation_col, as returned by sample_segment_elevations
+        elevation_col (str): name of column with elevation values
+
+    Returns:
+        elevation_start (array), elevation_end (array): elevation (in m) at the start and end vertex
+        of each segment (in the order of segs), NaN for segments without valid elevation values
+    """
+    elevation = ele.pivot_table(
+        index="segment_id",
+        columns="vertex_index",
+        values=elevation_col,
+        aggfunc="first",
+        dropna=False,
+    ).reindex(index=segs["segment_id"].values, columns=[0, -1])
+
+    vertex_count = ele.groupby("segment_id").size().reindex(segs["segment_id"].values)
+    if (vertex_count != 2).any():
+        print(f"Error, got {(vertex_count != 2).sum()} segment(s) without exactly 2 vertices")
+
+    invalid = (vertex_count != 2).values
+    elevation_start = np.where(invalid, np.nan, elevation[0].values)
+    elevation_end = np.where(invalid, np.nan, elevation[-1].values)
+
+    return elevation_start, elevation_end
+
+
+def compute_segment_elevation_changes(
+    segs, ele, elevation_col="elevation_1", elevations=None
+):
+    """
+    Compute the elevation change (end minus start elevation) of each segment
+
+    Arguments:
+        segs (gdf): segments with a unique "segment_id"
+        ele (df): elevation values at segment vertices (see pivot_segment_elevations)
+        elevation_col (str): name of column with elevation values
+        elevations (tuple): start and end elevations of segs, as returned by pivot_segment_elevations;
+            if None, they are computed from ele
+
+    Returns:
+        elevation_change (array): elevation change (in m) for each segment (in the order of segs),
+        NaN for segments without valid elevation values
+    """
+    if elevations is None:
+        elevations = pivot_segment_elevations(segs, ele, elevation_col=elevation_col)
+    elevation_start, elevation_end = elevations
+    return elevation_end - elevation_start
+
+
+def compute_segment_slopes(segs, ele, elevation_col="elevation_1", elevations=None):
+    """
+    Compute the slope of each segment from the elevation at its start and end vertex
+
+    Arguments:
+        segs (gdf): segments with a unique "segment_id"
+        ele (df): elevation values at segment vertices (see pivot_segment_elevations)
+        elevation_col (str): name of column with elevation values
+        elevations (tuple): start and end elevations of segs, as returned by pivot_segment_elevations;
+            if None, they are computed from ele
+
+    Returns:
+        slope (array): absolute slope (in %) for each segment (in the order of segs),
+        0 for segments without valid elevation values
+    """
+    elevation_change = compute_segment_elevation_changes(
+        segs, ele, elevation_col=elevation_col, elevations=elevations
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = np.abs(elevation_change) / segs.geometry.length.values * 100
+    slope[~np.isfinite(slope)] = 0
+
+    return slope
+
+
+def compute_edge_slopes(edges, segs):
+    """
+    Aggregate segment slopes per edge
+
+    Arguments:
+        edges (gdf): network edges with a unique "edge_id"
+        segs (gdf): segments with "edge_id" and "slope"
+
+    Returns:
+        edge_slopes (df): "min_slope", "max_slope" and "ave_slope" (mean of segment slopes)
+        for each edge (in the order of edges), 0 for edges without segments
+    """
+    edge_slopes = (
+        segs.groupby("edge_id")["slope"]
+        .agg(["min", "max", "mean"])
+        .rename(columns={"min": "min_slope", "max": "max_slope", "mean": "ave_slope"})
+        .reindex(edges["edge_id"].values)
+        .fillna(0)
+    )
+
+    return edge_slopes.set_index(edges.index)
+
+
+def compute_edge_climbs(edges, segs, window=300):
+    """
+    Compute climb metrics per edge from its segments (in the order of their segment_id,
+    i.e. along the edge geometry), in one pass over all segments.
+    Direction-aware metrics are computed for both directions of each edge: "_uv" from the start
+    to the end point of the edge geometry (from node u to node v), "_vu" in the opposite direction.
+
+    Arguments:
+        edges (gdf): network edges with a unique "edge_id"
+        segs (gdf): segments with "edge_id", "segment_id", "length", "slope" and
+            "elevation_change" (NaN for segments without valid elevation values, counted as flat)
+        window (numeric): length (in meters) of stretches for the maximum sustained slope
+
+    Returns:
+        edge_climbs (df): for each edge (in the order of edges), 0 for edges without segments:
+            "ave_slope_weighted": length-weighted average slope (in %)
+            "max_sustained_slope": steepest average slope over any stretch of window meters
+                of the edge (over the whole edge, if it is shorter than window), in %
+            "slope_uv", "slope_vu": average slope in each direction (net elevation change
+                over edge length, in %; negative if downhill)
+            "max_slope_uv", "max_slope_vu": slope of the steepest uphill segment in each direction (in %)
+            "ascent_uv", "ascent_vu", "descent_uv", "descent_vu": total ascent and descent in each direction (in m)
+            "max_sustained_slope_uv", "max_sustained_slope_vu": steepest uphill average slope over
+                any stretch of window meters in each direction (in %)
+    """
+    segs = segs.sort_values(["edge_id", "segment_id"])
+    edge_codes, seg_edge = np.unique(segs["edge_id"].values, return_inverse=True)
+    edge_count = len(edge_codes)
+    length = segs["length"].values
+    elevation_change = np.nan_to_num(segs["elevation_change"].values)
+
+    # length-weighted average slope, net slope, ascent and descent
+    edge_length = np.bincount(seg_edge, weights=length, minlength=edge_count)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ave_slope_weighted = (
+            np.bincount(seg_edge, weights=segs["slope"].values * length, minlength=edge_count)
+            / edge_length
+        )
+        slope_uv = (
+            np.bincount(seg_edge, weights=elevation_change, minlength=edge_count)
+            / edge_length
+            * 100
+        )
+        seg_slope_uv = elevation_change / length * 100
+    seg_slope_uv[~np.isfinite(seg_slope_uv)] = 0
+    ascent_uv = np.bincount(
+        seg_edge, weights=np.maximum(elevation_change, 0), minlength=edge_count
+    )
+    descent_uv = np.bincount(
+        seg_edge, weights=np.maximum(-elevation_change, 0), minlength=edge_count
+    )
+    max_slope_uv = np.zeros(edge_count)
+    max_slope_vu = np.zeros(edge_count)
+    np.maximum.at(max_slope_uv, seg_edge, seg_slope_uv)
+    np.maximum.at(max_slope_vu, seg_edge, -seg_slope_uv)
+
+    # elevation profile of all edges along one axis (edges separated by a gap longer than window,
+    # so that no stretch reaches into the next edge): segment vertices at positions (start of
+    # first segment, end of each segment) with elevation relative to the start of the edge
+    edge_offset = np.cumsum(edge_length + window + 1) - (edge_length + window + 1)
+    vertex_edge = np.concatenate([np.arange(edge_count), seg_edge])
+    vertex_position = np.concatenate(
+        [edge_offset, edge_offset[seg_edge] + _cumsum_by_group(length, seg_edge)]
+    )
+    vertex_elevation = np.concatenate(
+        [np.zeros(edge_count), _cumsum_by_group(elevation_change, seg_edge)]
+    )
+    order = np.lexsort((vertex_position, vertex_edge))
+    vertex_edge = vertex_edge[order]
+    vertex_position = vertex_position[order]
+    vertex_elevation = vertex_elevation[order]
+
+    # the steepest stretch starts or ends at a vertex: check stretches starting at each vertex
+    # and stretches ending at each vertex (where they fit into the edge), in both directions
+    edge_start = edge_offset[vertex_edge]
+    edge_end = edge_start + edge_length[vertex_edge]
+    fits_end = vertex_position + window <= edge_end
+    fits_start = vertex_position - window >= edge_start
+    rise_forward = (
+        np.interp(vertex_position + window, vertex_position, vertex_elevation)
+        - vertex_elevation
+    )
+    rise_backward = vertex_elevation - np.interp(
+        vertex_position - window, vertex_position, vertex_elevation
+    )
+    sustained_uv = np.zeros(len(vertex_position))
+    sustained_vu = np.zeros(len(vertex_position))
+    sustained_uv[fits_end] = rise_forward[fits_end] / window * 100
+    sustained_vu[fits_end] = -rise_forward[fits_end] / window * 100
+    sustained_uv[fits_start] = np.maximum(
+        sustained_uv[fits_start], rise_backward[fits_start] / window * 100
+    )
+    sustained_vu[fits_start] = np.maximum(
+        sustained_vu[fits_start], -rise_backward[fits_start] / window * 100
+    )
+    max_sustained_slope_uv = np.zeros(edge_count)
+    max_sustained_slope_vu = np.zeros(edge_count)
+    np.maximum.at(max_sustained_slope_uv, vertex_edge, sustained_uv)
+    np.maximum.at(max_sustained_slope_vu, vertex_edge, sustained_vu)
+
+    # edges shorter than window: average slope of the whole edge
+    short = edge_length < window
+    max_sustained_slope_uv[short] = np.maximum(slope_uv[short], 0)
+    max_sustained_slope_vu[short] = np.maximum(-slope_uv[short], 0)
+
+    edge_climbs = pd.DataFrame(
+        {
+            "ave_slope_weighted": ave_slope_weighted,
+            "max_sustained_slope": np.maximum(
+                max_sustained_slope_uv, max_sustained_slope_vu
+            ),
+            "slope_uv": slope_uv,
+            "slope_vu": -slope_uv,
+            "max_slope_uv": max_slope_uv,
+            "max_slope_vu": max_slope_vu,
+            "ascent_uv": ascent_uv,
+            "ascent_vu": descent_uv,
+            "descent_uv": descent_uv,
+            "descent_vu": ascent_uv,
+            "max_sustained_slope_uv": max_sustained_slope_uv,
+            "max_sustained_slope_vu": max_sustained_slope_vu,
+        },
+        index=edge_codes,
+    )
+    edge_climbs = edge_climbs.replace([np.inf, -np.inf], np.nan)
+    edge_climbs = edge_climbs.reindex(edges["edge_id"].values).fillna(0)
+
+    return edge_climbs.set_index(edges.index)
+
+
+def compute_edge_profiles(segs, ele, elevation_col="elevation_1"):
+    """
+    Compute a compact elevation profile for each edge: elevation at the start and end vertex
+    of each segment, with the distance along the edge geometry (from node u to node v)
+
+    Arguments:
+        segs (gdf): segments with "edge_id" and "segment_id"
+        ele (df): elevation values at segment vertices (see pivot_segment_elevations)
+        elevation_col (str): name of column with elevation values
+
+    Returns:
+        profiles (dict): "edge_id" (one per edge), "offsets" (profile of edge i is stored
+        at offsets[i]:offsets[i+1]), "position" and "elevation" (in m, NaN if unknown) of profile points
+    """
+    elevation_start, elevation_end = pivot_segment_elevations(
+        segs, ele, elevation_col=elevation_col
+    )
+    order = np.lexsort((segs["segment_id"].values, segs["edge_id"].values))
+    edge_ids, seg_edge = np.unique(segs["edge_id"].values[order], return_inverse=True)
+    length = shapely.length(segs.geometry.values)[order]
+
+    # one profile point at the start of each edge, plus one at the end of each segment
+    first_seg = np.searchsorted(seg_edge, np.arange(len(edge_ids)))
+    point_edge = np.concatenate([np.arange(len(edge_ids)), seg_edge])
+    point_position = np.concatenate(
+        [np.zeros(len(edge_ids)), _cumsum_by_group(length, seg_edge)]
+    )
+    point_elevation = np.concatenate(
+        [elevation_start[order][first_seg], elevation_end[order]]
+    )
+    point_order = np.lexsort((point_position, point_edge))
+
+    profiles = {
+        "edge_id": edge_ids,
+        "offsets": np.concatenate([[0], np.cumsum(np.bincount(seg_edge) + 1)]),
+        "position": point_position[point_order].astype(np.float32),
+        "elevation": point_elevation[point_order].astype(np.float32),
+    }
+    return profiles
+
+
+def save_edge_profiles(profiles, filepath):
+    """
+    Save edge elevation profiles (see compute_edge_profiles) to a compressed .npz file
+    """
+    np.savez_compressed(filepath, **profiles)
+
+
+def load_edge_profile(profiles, edge_id, direction="uv"):
+    """
+    Get the elevation profile of one edge
+
+    Arguments:
+        profiles (dict or NpzFile): edge profiles as returned by compute_edge_profiles,
+            or loaded from file with np.load
+        edge_id: id of the edge
+        direction (str): "uv" (from the start to the end point of the edge geometry) or "vu" (reversed)
+
+    Returns:
+        position (array), elevation (array): distance along the edge (in m) and elevation (in m)
+        of the profile points, in the given direction
+    """
+    i = np.searchsorted(profiles["edge_id"], edge_id)
+    assert i < len(profiles["edge_id"]) and profiles["edge_id"][i] == edge_id, (
+        f"No elevation profile for edge {edge_id}"
+    )
+    start, end = profiles["offsets"][i], profiles["offsets"][i + 1]
+    position = profiles["position"][start:end]
+    elevation = profiles["elevation"][start:end]
+    if direction == "vu":
+        position = position[-1] - position[::-1]
+        elevation = elevation[::-1]
+
+    return position, elevation
+
+
+def _cumsum_by_group(values, groups):
+    """
+    Cumulative sum of values within consecutive groups (groups must be sorted)
+    """
+    total = np.cumsum(values)
+    group_start = np.searchsorted(groups, groups, side="left")
+    return total - (total[group_start] - values[group_start])
+
+
+def compute_slope_histogram(slope, length, bin_width=1, max_slope=30):
+    """
+    Compute a histogram of segment slopes, by number and by length of segments
+
+    Arguments:
+        slope (array): slope of each segment (in %)
+        length (array): length of each segment (in m)
+        bin_width (numeric): width of histogram bins (in %)
+        max_slope (numeric): upper end of the last regular bin (in %); all steeper segments
+            are counted in one additional bin
+
+    Returns:
+        histogram (dict): "bins" (lower end of each bin, in %), "count" (number of segments per bin),
+        "length" (total length of segments per bin, in m)
+    """
+    bins = np.arange(0, max_slope, bin_width)
+    bin_idx = np.searchsorted(bins, slope, side="right") - 1
+    bin_idx = np.clip(bin_idx, 0, len(bins))
+    bin_idx[slope >= max_slope] = len(bins)
+
+    histogram = {
+        "bins": [float(b) for b in np.append(bins, max_slope)],
+        "count": [int(c) for c in np.bincount(bin_idx, minlength=len(bins) + 1)],
+        "length": [
+            float(l)
+            for l in np.bincount(bin_idx, weights=length, minlength=len(bins) + 1)
+        ],
+    }
+    return histogram
+
+
+def save_segment_arrays(
+    segs, filepath, columns=("segment_id", "edge_id", "length", "slope")
+):
+    """
+    Save per-segment values as columns (one array per column) to a compressed .npz file
+    (read back lazily with np.load: each array is only loaded when it is accessed)
+    """
+    np.savez_compressed(filepath, **{col: segs[col].values for col in columns})
+
+
+def resample_segments(edges, segs, ele, segment_length, elevation_col="elevation_1"):
+    """
+    Split edges into segments of another maximum length, with elevation values derived
+    from already sampled (finer) segments instead of the DEM: the elevation at each new segment
+    start and end point is interpolated linearly along the sampled segment of the same edge
+    at the same distance along the edge (exact if segment_length is a multiple of the length
+    of the sampled segments)
+
+    Arguments:
+        edges (gdf): network edges with a unique "edge_id"
+        segs (gdf): sampled segments with "edge_id" and "segment_id" (see split_lines_by_length)
+        ele (df): elevation values at their vertices (see sample_segment_elevations)
+        segment_length (numeric): maximum length of new segments (in meters)
+        elevation_col (str): name of column with elevation values
+
+    Returns:
+        segs_resampled (gdf), ele_resampled (df): new segments and elevation values at their start
+        and end vertices (same format as split_lines_by_length and sample_segment_elevations)
+    """
+    segs_resampled = split_lines_by_length(edges, segment_length)
+    elevation_start, elevation_end = pivot_segment_elevations(
+        segs, ele, elevation_col=elevation_col
+    )
+
+    # sampled segments in order along their edge, with their start and end position on one axis
+    # for all edges (distance along the edge, plus the length of all previous edges and one meter each)
+    order = np.lexsort((segs["segment_id"].values, segs["edge_id"].values))
+    edge_ids, seg_edge = np.unique(segs["edge_id"].values[order], return_inverse=True)
+    seg_edge = seg_edge.ravel()
+    length = shapely.length(segs.geometry.values)[order]
+    edge_length = np.bincount(seg_edge, weights=length, minlength=len(edge_ids))
+    edge_offset = np.cumsum(edge_length + 1) - (edge_length + 1)
+    seg_end = edge_offset[seg_edge] + _cumsum_by_group(length, seg_edge)
+    seg_start = seg_end - length
+    elevation_start, elevation_end = elevation_start[order], elevation_end[order]
+
+    # new segments in order along their edge, with their start and end position on the same axis
+    new_order = np.lexsort(
+        (segs_resampled["segment_id"].values, segs_resampled["edge_id"].values)
+    )
+    new_edge_ids = segs_resampled["edge_id"].values[new_order]
+    new_length = shapely.length(segs_resampled.geometry.values)[new_order]
+    _, new_group = np.unique(new_edge_ids, return_inverse=True)
+    new_end = _cumsum_by_group(new_length, new_group.ravel())
+    sampled = np.isin(new_edge_ids, edge_ids)
+    new_offset = edge_offset[np.searchsorted(edge_ids, new_edge_ids[sampled])]
+    new_end = new_end[sampled] + new_offset
+    new_start = new_end - new_length[sampled]
+
+    # sampled segment that each point lies on: for start points the segment starting there,
+    # for end points the segment ending there (where the parts of multi-part edges meet)
+    tolerance = 1e-6
+    seg_idx = np.concatenate(
+        [
+            np.searchsorted(seg_start, new_start + tolerance, side="right") - 1,
+            np.minimum(
+                np.searchsorted(seg_end, new_end - tolerance, side="left"),
+                len(seg_end) - 1,
+            ),
+        ]
+    )
+    position = np.concatenate([new_start, new_end])
+
+    # linear interpolation along the sampled segment
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fraction = np.clip((position - seg_start[seg_idx]) / length[seg_idx], 0, 1)
+    fraction[length[seg_idx] == 0] = 0
+    values = np.full(2 * len(segs_resampled), np.nan)
+    values[np.concatenate([sampled, sampled])] = elevation_start[seg_idx] + fraction * (
+        elevation_end[seg_idx] - elevation_start[seg_idx]
+    )
+
+    ele_resampled = pd.DataFrame(
+        {
+            "segment_id": np.concatenate(
+                [segs_resampled["segment_id"].values[new_order]] * 2
+            ),
+            "vertex_index": np.repeat([0, -1], len(segs_resampled)),
+            elevation_col: values,
+        }
+    )
+    ele_resampled = ele_resampled.sort_values(
+        ["segment_id", "vertex_index"], ascending=[True, False]
+    )
+
+    return segs_resampled, ele_resampled.reset_index(drop=True)
+
+
+def add_segment_slopes(segs, ele, elevation_col="elevation_1"):
+    """
+    Add "length", "slope" (absolute, in %) and "elevation_change" (in m) columns to segments
+    (see compute_segment_slopes and compute_segment_elevation_changes)
+    """
+    elevations = pivot_segment_elevations(segs, ele, elevation_col=elevation_col)
+    segs["length"] = segs.length
+    segs["slope"] = compute_segment_slopes(
+        segs, ele, elevation_col=elevation_col, elevations=elevations
+    )
+    segs["elevation_change"] = compute_segment_elevation_changes(
+        segs, ele, elevation_col=elevation_col, elevations=elevations
+    )
+    return segs
+
+
+def add_edge_slopes(edges, segs, window=300):
+    """
+    Add slope columns to edges: "min_slope", "max_slope", "ave_slope" (see compute_edge_slopes)
+    and climb metrics (see compute_edge_climbs)
+    """
+    edges = edges.copy()
+    edge_slopes = compute_edge_slopes(edges, segs)
+    edge_climbs = compute_edge_climbs(edges, segs, window=window)
+    for col in list(edge_slopes.columns) + list(edge_climbs.columns):
+        edges[col] = edge_slopes[col] if col in edge_slopes else edge_climbs[col]
+    return edges
+
+
+def compute_slope_stats(segs, segments_arrays_fp):
+    """
+    Compute summary statistics of segment slopes (and save per-segment values to segments_arrays_fp,
+    see save_segment_arrays)
+
+    Returns:
+        res (dict): number and total length of segments, minimum, maximum and mean slope,
+        slope histogram (see compute_slope_histogram), and filename of per-segment arrays
+    """
+    save_segment_arrays(segs, segments_arrays_fp)
+    res = {}
+    res["segs_count"] = len(segs)
+    res["segs_length_total"] = float(segs.length.sum())
+    res["segs_slope_min"] = float(segs.slope.min())
+    res["segs_slope_max"] = float(segs.slope.max())
+    res["segs_slope_mean"] = float(segs.slope.mean())
+    res["segs_slope_histogram"] = compute_slope_histogram(
+        segs["slope"].values, segs["length"].values
+    )
+    res["segs_arrays"] = os.path.basename(segments_arrays_fp)
+    return res
+
+
+### PARALLEL SLOPE COMPUTATION
+
+
+def split_edges_into_chunks(edges, chunk_count):
+    """
+    Split edges into spatially coherent chunks: edges are ordered along a Z-order curve
+    of their centroids (so that nearby edges end up in the same chunk, and each chunk
+    touches few DEM windows), then cut into chunks of similar total length
+
+    Arguments:
+        edges (gdf): network edges
+        chunk_count (int): number of chunks
+
+    Returns:
+        chunks (list of arrays): positions (in edges) of the edges in each chunk
+    """
+    if len(edges) == 0:
+        return []
+
+    centroids = shapely.get_coordinates(shapely.centroid(edges.geometry.values))
+    minx, miny = centroids.min(axis=0)
+    extent = max((centroids.max(axis=0) - [minx, miny]).max(), 1)
+    cells = ((centroids - [minx, miny]) / extent * 65535).astype(np.uint64)
+    order = np.argsort(_interleave_bits(cells[:, 0], cells[:, 1]), kind="stable")
+
+    length = np.cumsum(edges.geometry.length.values[order])
+    chunk_nr = np.minimum(
+        (length / max(length[-1], 1) * chunk_count).astype(np.int64), chunk_count - 1
+    )
+    chunks = [np.sort(order[chunk_nr == c]) for c in range(chunk_count)]
+
+    return [c for c in chunks if len(c)]
+
+
+def _interleave_bits(x, y):
+    """
+    Z-order (Morton) code of 16 bit integer coordinates
+    """
+    codes = np.zeros(len(x), dtype=np.uint64)
+    for bit in range(16):
+        codes |= ((x >> np.uint64(bit)) & np.uint64(1)) << np.uint64(2 * bit)
+        codes |= ((y >> np.uint64(bit)) & np.uint64(1)) << np.uint64(2 * bit + 1)
+    return codes
+
+
+def sample_edge_chunk(
+    edges,
+    dem_fp,
+    segment_length,
+    window_size=1024,
+    cache_dir=None,
+    elevation_col="elevation_1",
+):
+    """
+    Split edges into segments and get the elevation at segment start and end points
+    (see split_lines_by_length and sample_segment_elevations), reading the DEM in windows
+
+    Returns:
+        segs (gdf), ele (df): segments and elevation values at their start and end vertices
+    """
+    segs = split_lines_by_length(edges, segment_length)
+    dem = DemWindows(dem_fp, window_size=window_size, cache_dir=cache_dir)
+    ele = sample_segment_elevations(segs, dem, elevation_col=elevation_col)
+    dem.close()
+
+    return segs, ele
+
+
+def sample_edges(
+    edges,
+    dem_fp,
+    segment_length,
+    workers=1,
+    window_size=1024,
+    cache_dir=None,
+    elevation_col="elevation_1",
+):
+    """
+    Split edges into segments and get the elevation at segment start and end points,
+    either in the main process or in spatially coherent chunks (see split_edges_into_chunks)
+    spread across a pool of worker processes. The results do not depend on the number of workers:
+    chunks are merged back into the order of edges, with the same segment ids as without chunks.
+
+    Arguments:
+        edges (gdf): network edges with a unique "edge_id"
+        dem_fp (str): filepath to DEM raster (e.g. dem.tif)
+        segment_length (numeric): maximum segment length (in meters)
+        workers (int): number of worker processes; if 1, all edges are processed in the main process
+        window_size (int): width and height of DEM windows (in raster cells), see DemWindows
+        cache_dir (str): folder for memory-mapped DEM windows, see DemWindows
+        elevation_col (str): name of column for elevation values
+
+    Returns:
+        segs (gdf), ele (df): segments and elevation values at their start and end vertices
+        (see split_lines_by_length and sample_segment_elevations)
+    """
+    if workers <= 1:
+        return sample_edge_chunk(
+            edges, dem_fp, segment_length, window_size, cache_dir, elevation_col
+        )
+
+    # worker functions must be importable by the worker processes (see import_worker_module)
+    from src.mp_func import get_mp_context, import_worker_module
+
+    worker_module = import_worker_module("slope_func")
+
+    chunks = split_edges_into_chunks(edges, workers * 4)
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(chunks)),
+        mp_context=get_mp_context(),
+    ) as executor:
+        futures = [
+            executor.submit(
+                worker_module.sample_edge_chunk,
+                edges.iloc[chunk],
+                dem_fp,
+                segment_length,
+                window_size,
+                cache_dir,
+                elevation_col,
+            )
+            for chunk in chunks
+        ]
+        results = [future.result() for future in futures]
+
+    # make segment ids unique across chunks
+    seg_offset = 0
+    for segs_chunk, ele_chunk in results:
+        segs_chunk["segment_id"] += seg_offset
+        ele_chunk["segment_id"] += seg_offset
+        seg_offset += len(segs_chunk)
+    segs = pd.concat([r[0] for r in results], ignore_index=True)
+    ele = pd.concat([r[1] for r in results], ignore_index=True)
+
+    # back into the order of edges (segments of each edge stay in order), with new segment ids
+    edge_pos = pd.Index(edges["edge_id"].values).get_indexer(segs["edge_id"].values)
+    segs = segs.iloc[np.argsort(edge_pos, kind="stable")].reset_index(drop=True)
+    new_ids = pd.Series(np.arange(1, len(segs) + 1), index=segs["segment_id"].values)
+    segs["segment_id"] = new_ids.values
+    ele["segment_id"] = new_ids.loc[ele["segment_id"].values].values
+    ele = ele.sort_values(["segment_id", "vertex_index"], ascending=[True, False])
+    segs = gpd.GeoDataFrame(segs, geometry=segs.geometry.name, crs=edges.crs)
+
+    return segs, ele.reset_index(drop=True)
+
@@ -1,7 +1,9 @@
 import os
 os.environ["USE_PYGEOS"] = "0"
 import re
+import json
 import shutil
+import numpy as np
 import geopandas as gpd
 import pandas as pd
 import momepy
@@ -665,4 +667,29 @@ def load_evaluation_data(homepath):
                     evaldict[geomtype][geomlayer_name]["gpkg"] = gpd.read_file(
                         geompath_output + geomlayer_name_out
                     )
-    return evaldict
\ No newline at end of file
+    return evaldict
+
+
+def load_slope_stats(homepath):
+    """
+    Load slope statistics of script03: summary statistics and histogram from stats_slope.json;
+    per-segment arrays ("segment_id", "edge_id", "length", "slope") from stats_slope_segments.npz,
+    loaded lazily (each array is only read from file when it is accessed, e.g. slope_stats["segments"]["slope"])
+
+    Arguments:
+        homepath (str): path of the QGIS project
+
+    Returns:
+        slope_stats (dict): statistics of stats_slope.json, with "segments" (lazily loaded arrays;
+        None if not available); None if no slope statistics are available
+    """
+    stats_folder = homepath + "/results/stats/"
+    if not os.path.exists(stats_folder + "stats_slope.json"):
+        return None
+
+    slope_stats = json.load(open(stats_folder + "stats_slope.json", "r"))
+    segments_fp = stats_folder + slope_stats.get("segs_arrays", "stats_slope_segments.npz")
+    slope_stats["segments"] = np.load(segments_fp) if os.path.exists(segments_fp) else None
+
+    return slope_stats
+
@@ -0,0 +1,69 @@
+import numpy as np
+import geopandas as gpd
+import shapely
+import pytest
+
+from src import eval_func
+
+
+def make_edges(n=300, seed=5):
+    rng = np.random.default_rng(seed)
+    start = rng.uniform(0, 10000, (n, 2))
+    offset = rng.uniform(-800, 800, (n, 2))
+    mid = start + offset * rng.uniform(0.3, 0.7, (n, 1)) + rng.uniform(-100, 100, (n, 2))
+    lines = [shapely.LineString([a, m, a + d]) for a, m, d in zip(start, mid, offset)]
+    return gpd.GeoDataFrame({"edge_id": range(n)}, geometry=lines, crs="EPSG:25832")
+
+
+def make_polygons(n=60, vertices=64, seed=6):
+    rng = np.random.default_rng(seed)
+    geoms = []
+    for _ in range(n):
+        x, y = rng.uniform(0, 10000, 2)
+        angles = np.sort(rng.uniform(0, 2 * np.pi, vertices))
+        radii = rng.uniform(200, 900) * rng.uniform(0.6, 1.0, vertices)
+        ring = np.c_[x + radii * np.cos(angles), y + radii * np.sin(angles)]
+        geoms.append(shapely.make_valid(shapely.Polygon(ring)))
+    types = rng.choice(["farm", "wetland", "forest"], n)
+    return gpd.GeoDataFrame({"type": types}, geometry=geoms, crs="EPSG:25832")
+
+
+def overlay_lengths(poly, edges, polygon_buffer):
+    # reference: intersect the edges with the union of all and of each type of buffered polygons
+    buffered = poly.buffer(polygon_buffer)
+    within = edges.intersection(buffered.union_all()).length.sum()
+    by_type = {
+        t: edges.intersection(buffered[poly["type"] == t].union_all()).length.sum()
+        for t in poly["type"].unique()
+    }
+    return within, by_type
+
+
+@pytest.mark.parametrize("max_vertices", [None, 16])
+@pytest.mark.parametrize("engine", ["union", "local"])
+def test_type_lengths_match_per_type_overlay(engine, max_vertices):
+    edges = make_edges()
+    poly = make_polygons()
+    within, by_type = overlay_lengths(poly, edges, 50)
+
+    gdf_inter, _, type_lengths = eval_func.evaluate_polygon_layer(
+        poly, edges, 50, engine=engine, type_lengths=True, max_vertices=max_vertices
+    )
+
+    assert gdf_inter.length.sum() == pytest.approx(within, rel=1e-9)
+    assert type_lengths["type"].keys() == by_type.keys()
+    for t, length in by_type.items():
+        assert type_lengths["type"][t] == pytest.approx(length, rel=1e-9)
+
+
+def test_evaluate_polygon_layer_keeps_input_polygons():
+    edges = make_edges()
+    poly = make_polygons()
+    poly_input = poly.copy()
+
+    eval_func.evaluate_polygon_layer(poly, edges, 50)
+    buffer_curve = eval_func.compute_buffer_curve(poly, edges, [50], segment_length=1)
+    within, _ = overlay_lengths(poly, edges, 50)
+
+    assert poly.geometry.equals(poly_input.geometry)
+    assert buffer_curve[50]["within"] == pytest.approx(within, rel=5e-3)
@@ -0,0 +1,79 @@
+import numpy as np
+import geopandas as gpd
+import shapely
+import pytest
+
+from src import slope_func
+
+
+class WavyDem:
+    # stands in for DemWindows: hills and valleys, so that interpolated elevations are only exact
+    # at the sampled points
+    def sample(self, x, y):
+        x, y = np.asarray(x), np.asarray(y)
+        return 40 * np.sin(x / 170) * np.cos(y / 230) + 0.002 * x * y / 100
+
+
+def make_edges(n=50, seed=3):
+    rng = np.random.default_rng(seed)
+    lines = [
+        shapely.LineString(
+            np.cumsum(rng.normal(0, 60, (rng.integers(2, 12), 2)), axis=0)
+            + rng.uniform(0, 5000, 2)
+        )
+        for _ in range(n)
+    ]
+    lines += [
+        # crossing itself: the point at 100 m lies in the middle of the segment from 450 to 500 m
+        shapely.LineString([(0, 0), (200, 0), (200, 80), (100, 80), (100, -100)]),
+        # loop, ending at its start point
+        shapely.LineString([(300, 300), (600, 300), (600, 600), (300, 300)]),
+        # two parts
+        shapely.MultiLineString([[(700, 100), (1000, 100)], [(700, 200), (700, 480)]]),
+    ]
+    return gpd.GeoDataFrame(
+        {"edge_id": np.arange(len(lines)) * 2}, geometry=lines, crs="EPSG:25832"
+    )
+
+
+def test_segment_length_list():
+    # same steps as script03 with segment_length: [100, 50, 200]
+    segment_lengths = [100, 50, 200]
+    edges = make_edges()
+    edges_columns = list(edges.columns)
+
+    sample_length = min(segment_lengths)
+    segs_sampled = slope_func.split_lines_by_length(edges, sample_length)
+    ele_sampled = slope_func.sample_segment_elevations(segs_sampled, WavyDem())
+
+    segs, ele = slope_func.resample_segments(
+        edges, segs_sampled, ele_sampled, segment_lengths[0]
+    )
+    segs = slope_func.add_segment_slopes(segs, ele)
+    edges = slope_func.add_edge_slopes(edges, segs)
+    profiles = slope_func.compute_edge_profiles(segs_sampled, ele_sampled)
+
+    # profiles end at the edge length, at the elevation of the edge end point
+    ends = profiles["offsets"][1:] - 1
+    assert np.allclose(profiles["position"][ends], edges.length.values, atol=1e-2)
+    coords, coord_edge = shapely.get_coordinates(edges.geometry.values, return_index=True)
+    end_points = coords[np.r_[np.flatnonzero(np.diff(coord_edge)), len(coords) - 1]]
+    assert np.allclose(
+        profiles["elevation"][ends], WavyDem().sample(*end_points.T), atol=1e-2
+    )
+
+    for other_length in segment_lengths[1:]:
+        segs_other, ele_other = slope_func.resample_segments(
+            edges[edges_columns], segs_sampled, ele_sampled, other_length
+        )
+        segs_other = slope_func.add_segment_slopes(segs_other, ele_other)
+        segs_direct = slope_func.split_lines_by_length(edges[edges_columns], other_length)
+        ele_direct = slope_func.sample_segment_elevations(segs_direct, WavyDem())
+        segs_direct = slope_func.add_segment_slopes(segs_direct, ele_direct)
+
+        # segment_length is a multiple of sample_length: all new segment vertices were sampled
+        assert list(segs_other.columns) == list(segs_direct.columns)
+        assert ele_other["elevation_1"].values == pytest.approx(
+            ele_direct["elevation_1"].values
+        )
+        assert segs_other["slope"].values == pytest.approx(segs_direct["slope"].values)